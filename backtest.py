@@ -0,0 +1,180 @@
+import itertools
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import indicators
+
+TRADING_DAYS = indicators.TRADING_DAYS
+YEAR_SECONDS = 365.25 * 86400
+# Below this many price points times parameter sets, a process pool costs more than it saves.
+POOL_THRESHOLD = 2_000_000
+
+# name -> (label, parameter names, default grid)
+STRATEGIES = {
+    'hold': ("Buy and hold", (), {}),
+    'ma': ("MA crossover", ('fast', 'slow'), {'fast': [10, 20, 50], 'slow': [100, 200]}),
+    'rsi': ("RSI mean reversion", ('period', 'low', 'high'), {'period': [14], 'low': [30], 'high': [70]}),
+}
+STAT_NAMES = ('cagr', 'maxdd', 'sharpe', 'trades')
+
+
+def parse_values(spec: str) -> List[float]:
+    # "10,20,50" lists values; "10:50:10" is an inclusive range with a step.
+    if ':' in spec:
+        start, stop, step = (float(v) for v in (spec.split(':') + ['1'])[:3])
+        if step <= 0 or stop < start:
+            raise ValueError(f"bad range '{spec}'")
+        return [start + i * step for i in range(int(math.floor((stop - start) / step + 1e-9)) + 1)]
+    return [float(v) for v in spec.split(',') if v]
+
+
+def param_grid(strategy: str, overrides: Dict[str, str]) -> List[Tuple[float, ...]]:
+    _, names, defaults = STRATEGIES[strategy]
+    unknown = set(overrides) - set(names)
+    if unknown:
+        raise ValueError(f"unknown parameter {', '.join(sorted(unknown))}; {strategy} takes {', '.join(names) or 'none'}")
+    axes = [parse_values(overrides[n]) if n in overrides else defaults[n] for n in names]
+    grid = list(itertools.product(*axes))
+    if strategy == 'ma':
+        grid = [p for p in grid if 0 < p[0] < p[1]]
+    elif strategy == 'rsi':
+        grid = [p for p in grid if p[0] >= 2 and p[1] < p[2]]
+    if not grid:
+        raise ValueError("no valid parameter combinations")
+    return grid
+
+
+def _forward_fill(signal: np.ndarray) -> np.ndarray:
+    # Carries the last non-NaN value along each row; leading NaNs become 0 (flat).
+    index = np.where(np.isnan(signal), 0, np.arange(signal.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    filled = np.take_along_axis(signal, index, axis=1)
+    return np.nan_to_num(filled, nan=0.0)
+
+
+def positions(strategy: str, closes: np.ndarray, grid: Sequence[Tuple[float, ...]]) -> np.ndarray:
+    # One row per parameter set: 1.0 long, 0.0 flat, decided at each close.
+    if strategy == 'hold':
+        return np.ones((1, len(closes)))
+    if strategy == 'ma':
+        windows = sorted({int(w) for p in grid for w in p})
+        means = {w: indicators.sma(closes, w) for w in windows}
+        fast = np.vstack([means[int(p[0])] for p in grid])
+        slow = np.vstack([means[int(p[1])] for p in grid])
+        with np.errstate(invalid='ignore'):
+            return (fast > slow).astype(np.float64)
+    periods = sorted({int(p[0]) for p in grid})
+    strengths = {n: indicators.rsi(closes, n) for n in periods}
+    rsi = np.vstack([strengths[int(p[0])] for p in grid])
+    low = np.array([p[1] for p in grid])[:, None]
+    high = np.array([p[2] for p in grid])[:, None]
+    # Enter below `low`, exit above `high`, otherwise keep the previous position.
+    with np.errstate(invalid='ignore'):
+        signal = np.where(rsi < low, 1.0, np.where(rsi > high, 0.0, np.nan))
+    return _forward_fill(signal)
+
+
+def strategy_returns(closes: np.ndarray, held: np.ndarray, cost: float) -> Tuple[np.ndarray, np.ndarray]:
+    # The position taken at close t earns the return from t to t+1; each change pays `cost` of notional.
+    returns = np.diff(closes) / closes[:-1]
+    turnover = np.abs(np.diff(held, axis=1, prepend=0.0))[:, :-1]
+    return held[:, :-1] * returns - cost * turnover, (turnover > 0).sum(axis=1)
+
+
+def summarize(daily: np.ndarray, years: float) -> Dict[str, np.ndarray]:
+    equity = np.cumprod(1.0 + daily, axis=1)
+    final = equity[:, -1] if daily.shape[1] else np.ones(len(daily))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cagr = np.where(final > 0, np.power(np.maximum(final, 0.0), 1.0 / max(years, 1e-9)) - 1.0, -1.0)
+        peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+        maxdd = (equity / peak - 1.0).min(axis=1) if daily.shape[1] else np.zeros(len(daily))
+        std = daily.std(axis=1, ddof=1) if daily.shape[1] > 1 else np.zeros(len(daily))
+        sharpe = np.where(std > 0, daily.mean(axis=1) / std * math.sqrt(TRADING_DAYS), 0.0)
+    return {'cagr': cagr, 'maxdd': maxdd, 'sharpe': np.nan_to_num(sharpe)}
+
+
+def run_chunk(chunk: Sequence[Tuple[str, np.ndarray, np.ndarray]], dates: np.ndarray, strategy: str,
+              grid: Sequence[Tuple[float, ...]], cost: float):
+    # Per-ticker stats, plus per-day sums of strategy returns for the equal-weight portfolio.
+    sums = np.zeros((len(grid), len(dates)))
+    counts = np.zeros(len(dates))
+    per_ticker = {}
+    for ticker, stamps, closes in chunk:
+        if len(closes) < 2:
+            continue
+        daily, trades = strategy_returns(closes, positions(strategy, closes, grid), cost)
+        stats = summarize(daily, (stamps[-1] - stamps[0]) / YEAR_SECONDS)
+        stats['trades'] = trades
+        per_ticker[ticker] = np.vstack([stats[name] for name in STAT_NAMES])
+        slots = np.searchsorted(dates, stamps[1:])
+        sums[:, slots] += daily
+        counts[slots] += 1
+    return per_ticker, sums, counts
+
+
+class BacktestResult:
+    __slots__ = ('strategy', 'grid', 'tickers', 'per_ticker', 'portfolio', 'start', 'end', 'workers')
+
+    def __init__(self, strategy: str, grid, per_ticker: Dict[str, np.ndarray], portfolio: Dict[str, np.ndarray],
+                 start: int, end: int, workers: int):
+        self.strategy = strategy
+        self.grid = grid
+        self.tickers = sorted(per_ticker)
+        # ticker -> (stat x parameter set) array, rows in STAT_NAMES order
+        self.per_ticker = per_ticker
+        self.portfolio = portfolio
+        self.start = start
+        self.end = end
+        self.workers = workers
+
+    def ranked(self, by: str = 'sharpe') -> List[int]:
+        return sorted(range(len(self.grid)), key=lambda i: self.portfolio[by][i], reverse=True)
+
+    def label(self, i: int) -> str:
+        names = STRATEGIES[self.strategy][1]
+        return ' '.join(f"{n}={v:g}" for n, v in zip(names, self.grid[i])) or 'long'
+
+
+def run(series: Dict[str, Tuple[Sequence[int], Sequence[float]]], strategy: str = 'ma',
+        grid: Optional[List[Tuple[float, ...]]] = None, cost: float = 0.001,
+        workers: Optional[int] = None) -> BacktestResult:
+    # series maps ticker -> (timestamps, closes) of daily bars in time order.
+    grid = grid or param_grid(strategy, {})
+    data = [(t, np.asarray(s, dtype=np.int64), np.asarray(c, dtype=np.float64)) for t, (s, c) in series.items()]
+    data = [item for item in data if len(item[2]) >= 2]
+    if not data:
+        raise ValueError("no ticker has at least two daily bars")
+    dates = np.unique(np.concatenate([stamps[1:] for _, stamps, _ in data]))
+    work = sum(len(c) for _, _, c in data) * len(grid)
+    if workers is None:
+        workers = 1 if work < POOL_THRESHOLD else min(os.cpu_count() or 1, len(data))
+    if workers <= 1:
+        results = [run_chunk(data, dates, strategy, grid, cost)]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Several chunks per worker keep the pool busy when ticker histories differ in length.
+        step = max(1, math.ceil(len(data) / (workers * 4)))
+        chunks = [data[i:i + step] for i in range(0, len(data), step)]
+        # Spawned, not forked: the caller may be the daemon, whose alert monitor, HTTP pool and
+        # rate-limiter locks would be copied into each worker mid-use.
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(run_chunk, chunks, itertools.repeat(dates), itertools.repeat(strategy),
+                                    itertools.repeat(grid), itertools.repeat(cost)))
+    per_ticker: Dict[str, np.ndarray] = {}
+    sums = np.zeros((len(grid), len(dates)))
+    counts = np.zeros(len(dates))
+    for chunk_stats, chunk_sums, chunk_counts in results:
+        per_ticker.update(chunk_stats)
+        sums += chunk_sums
+        counts += chunk_counts
+    # Equal weight across the tickers trading each day, rebalanced daily.
+    daily = sums / np.maximum(counts, 1.0)
+    start = int(min(stamps[0] for _, stamps, _ in data))
+    end = int(dates[-1])
+    portfolio = summarize(daily, (end - start) / YEAR_SECONDS)
+    portfolio['trades'] = np.mean([stats[3] for stats in per_ticker.values()], axis=0)
+    return BacktestResult(strategy, grid, per_ticker, portfolio, start, end, workers)
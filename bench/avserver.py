@@ -0,0 +1,167 @@
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+MINUTE_NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+               "and 500 calls per day.")
+DAILY_NOTE = "You have reached the daily rate limit of 500 requests per day."
+COMPACT_BARS = 100
+FULL_DAILY_BARS = 2520
+FULL_INTRADAY_BARS = 2000
+INTRADAY_SECONDS = {'1min': 60, '5min': 300, '60min': 3600, '240min': 14400}
+
+
+class StandIn:
+    # Configuration and counters shared by every request handler thread.
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, daily_limit: int = 0, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.daily_limit = daily_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self._series: Dict[Tuple[str, str, int], bytes] = {}
+
+    def count(self, key: str):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    @staticmethod
+    def base_price(symbol: str) -> float:
+        return 10.0 + zlib.crc32(symbol.encode()) % 49000 / 100.0
+
+    def quote(self, symbol: str) -> Dict:
+        with self.lock:
+            price = self.base_price(symbol) * (1 + self.random.uniform(-0.02, 0.02))
+        return {"Global Quote": {"01. symbol": symbol, "05. price": f"{price:.4f}", "06. volume": "1000000",
+                                 "07. latest trading day": datetime.date.today().isoformat()}}
+
+    def series(self, symbol: str, interval: str, size: int) -> bytes:
+        key = (symbol, interval, size)
+        with self.lock:
+            body = self._series.get(key)
+        if body is not None:
+            return body
+        rng = random.Random(zlib.crc32(f"{symbol}:{interval}".encode()))
+        price = self.base_price(symbol)
+        step = INTRADAY_SECONDS.get(interval, 86400)
+        now = int(time.time()) // step * step
+        bars = {}
+        for i in range(size - 1, -1, -1):
+            open_ = price
+            price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+            high = max(open_, price) * (1 + abs(rng.gauss(0, 0.003)))
+            low = min(open_, price) * (1 - abs(rng.gauss(0, 0.003)))
+            moment = datetime.datetime.fromtimestamp(now - i * step, datetime.timezone.utc)
+            stamp = moment.strftime("%Y-%m-%d") if step == 86400 else moment.strftime("%Y-%m-%d %H:%M:%S")
+            bars[stamp] = {"1. open": f"{open_:.4f}", "2. high": f"{high:.4f}", "3. low": f"{low:.4f}",
+                           "4. close": f"{price:.4f}", "5. volume": str(rng.randint(1000, 100000))}
+        label = "Daily" if step == 86400 else interval
+        body = json.dumps({"Meta Data": {"2. Symbol": symbol}, f"Time Series ({label})": bars}).encode()
+        with self.lock:
+            self._series[key] = body
+        return body
+
+    def respond(self, params: Dict[str, str]) -> Tuple[int, bytes]:
+        function = params.get("function", "")
+        self.count("requests")
+        self.count(function or "unknown")
+        if self.daily_limit and self.counts.get("requests", 0) > self.daily_limit:
+            self.count("throttled_daily")
+            return 200, json.dumps({"Information": DAILY_NOTE}).encode()
+        if self.roll(self.error_rate):
+            self.count("errors")
+            return 503, b"Service Unavailable"
+        if self.roll(self.throttle_rate):
+            self.count("throttled")
+            return 200, json.dumps({"Note": MINUTE_NOTE}).encode()
+        symbol = params.get("symbol", "").upper()
+        if function == "GLOBAL_QUOTE":
+            return 200, json.dumps(self.quote(symbol)).encode()
+        compact = params.get("outputsize") == "compact"
+        if function == "TIME_SERIES_DAILY":
+            return 200, self.series(symbol, "day", COMPACT_BARS if compact else FULL_DAILY_BARS)
+        if function == "TIME_SERIES_INTRADAY":
+            interval = params.get("interval", "5min")
+            return 200, self.series(symbol, interval, COMPACT_BARS if compact else FULL_INTRADAY_BARS)
+        return 200, json.dumps({"Error Message": f"Invalid API call: {function}"}).encode()
+
+
+def make_handler(stand_in: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(stand_in.delay())
+            status, body = stand_in.respond(dict(parse_qsl(urlparse(self.path).query)))
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(stand_in: StandIn, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(stand_in))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="avserver", daemon=True).start()
+    return server
+
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/query"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Alpha Vantage quote and time series API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.02, help="uniform +/- seconds around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction answered with a per-minute Note")
+    parser.add_argument("--daily-limit", type=int, default=0, help="answer with the daily-limit Note after N requests")
+    opts = parser.parse_args()
+    stand_in = StandIn(opts.latency, opts.jitter, opts.error_rate, opts.throttle_rate, opts.daily_limit)
+    server = start_server(stand_in, port=opts.port)
+    print(f"Serving {server_url(server)} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(stand_in.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
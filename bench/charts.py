@@ -0,0 +1,56 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import charts  # noqa: E402
+
+
+def synthetic_bars(count: int, seed: int = 1):
+    # One-minute bars with a single high and a single low spike that every render must keep.
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, count)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0003, count)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0003, count)))
+    high[count // 3] = close.max() * 1.2
+    low[2 * count // 3] = close.min() * 0.8
+    stamps = 1_500_000_000 + 60 * np.arange(count)
+    return stamps, open_, high, low, close, rng.integers(100, 10_000, count).astype(np.float64)
+
+
+def best_of(runs: int, render) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time candlestick and line chart rendering of long bar series.")
+    parser.add_argument("--bars", type=int, default=5 * 252 * 390, help="bars to render (default: 5 years of minutes)")
+    parser.add_argument("--width", type=int, default=160)
+    parser.add_argument("--runs", type=int, default=5)
+    opts = parser.parse_args()
+
+    stamps, open_, high, low, close, volume = synthetic_bars(opts.bars)
+    frame = io.StringIO()
+    candles = best_of(opts.runs, lambda: frame.write(
+        charts.render_candles("bench", stamps, open_, high, low, close, volume, width=opts.width)))
+    line = best_of(opts.runs, lambda: frame.write(charts.render_line("bench", close, width=opts.width, stamps=stamps)))
+    kept = f"{high.max():.2f}" in charts.render_candles("bench", stamps, open_, high, low, close, volume,
+                                                        width=opts.width, colour=False)
+    print(f"{opts.bars} bars at {opts.width} columns: candles {candles:.1f} ms, line (LTTB) {line:.1f} ms, "
+          f"extremes kept: {'yes' if kept else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from avserver import StandIn, server_url, start_server  # noqa: E402
+
+SCENARIOS = ('popular', 'dashboard', 'positions', 'alerts', 'chart')
+SIZES = (10, 100, 1000)
+
+
+def portfolio(size: int):
+    tickers = [f"S{i:04d}" for i in range(size)]
+    return tickers, {t: {'qty': 10, 'cost': 1000.0} for t in tickers}
+
+
+def make_scenario(main, name: str, tickers, positions):
+    if name == 'alerts':
+        main.alert_engine.clear()
+        for ticker in tickers:
+            main.alert_engine.add_above(ticker, 1e9, main.ALERT_POLL_INTERVAL)
+
+        def sweep():
+            # One background monitor pass: batch quote every alerted ticker, then evaluate.
+            prices = main.get_market_prices(main.alert_engine.tickers(), priority=main.PRIORITY_ALERT,
+                                            max_age=main.ALERT_MIN_INTERVAL)
+            main.evaluate_alerts(prices)
+        return sweep
+    if name == 'chart':
+        return lambda: main.process_command('chart', [tickers[0], 'day'], positions)
+    return lambda: main.process_command(name, [], positions)
+
+
+_stores = itertools.count()
+
+
+def reset_caches(main, workdir: str):
+    main.quote_cache.clear()
+    main.market_data.clear()
+    main.bar_store = main.BarStore(os.path.join(workdir, f"bars-{next(_stores)}.db"))
+
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def run_case(main, stand_in, workdir: str, name: str, size: int, reps: int, warm: bool):
+    tickers, positions = portfolio(size)
+    main.portfolio_valuation.sync(positions)
+    run = make_scenario(main, name, tickers, positions)
+    sink = io.StringIO()
+    reset_caches(main, workdir)
+    if warm:
+        with redirect_stdout(sink):
+            run()
+    stand_in.reset()
+    latencies = []
+    for _ in range(reps):
+        if not warm:
+            reset_caches(main, workdir)
+        started = time.perf_counter()
+        with redirect_stdout(sink):
+            run()
+        latencies.append((time.perf_counter() - started) * 1000)
+        sink.seek(0)
+        sink.truncate()
+    counts = stand_in.snapshot()
+    # One more run under tracemalloc for peak allocations; it is slower, so it is not timed.
+    if not warm:
+        reset_caches(main, workdir)
+    tracemalloc.start()
+    with redirect_stdout(sink):
+        run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'scenario': name, 'size': size, 'reps': reps,
+        'p50_ms': round(percentile(latencies, 50), 1), 'p90_ms': round(percentile(latencies, 90), 1),
+        'p99_ms': round(percentile(latencies, 99), 1), 'max_ms': round(max(latencies), 1),
+        'http_per_run': round(counts.get('requests', 0) / reps, 1),
+        'errors': counts.get('errors', 0), 'throttled': counts.get('throttled', 0),
+        'peak_kb': peak // 1024,
+    }
+
+
+def print_table(results, baseline=None):
+    previous = {(r['scenario'], r['size']): r for r in baseline or []}
+    print(f"{'scenario':<10} {'size':>5} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'http/run':>9} "
+          f"{'err':>5} {'thr':>5} {'peak KB':>8}" + ("  p50 vs baseline" if previous else ""))
+    for r in results:
+        line = (f"{r['scenario']:<10} {r['size']:>5} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                f"{r['http_per_run']:>9.1f} {r['errors']:>5} {r['throttled']:>5} {r['peak_kb']:>8}")
+        old = previous.get((r['scenario'], r['size']))
+        if old and old['p50_ms']:
+            line += f"  {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run TradeCLI command scenarios against a local Alpha Vantage stand-in.")
+    parser.add_argument("--scenarios", default=','.join(SCENARIOS), help="comma-separated subset of " + ', '.join(SCENARIOS))
+    parser.add_argument("--sizes", default=','.join(map(str, SIZES)), help="portfolio sizes (default 10,100,1000)")
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="keep quote and bar caches between runs")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-pause", type=float, default=0.5, help="seconds TradeCLI waits after a throttle Note")
+    parser.add_argument("--av-per-minute", type=float, default=0,
+                        help="client rate limit to apply (default: none, to measure everything but the quota)")
+    parser.add_argument("--json", metavar="FILE", help="write results to FILE")
+    parser.add_argument("--baseline", metavar="FILE", help="compare p50 against an earlier --json FILE")
+    opts = parser.parse_args()
+    output = opts.json and os.path.abspath(opts.json)
+    baseline_path = opts.baseline and os.path.abspath(opts.baseline)
+
+    stand_in = StandIn(opts.latency, opts.jitter, opts.error_rate, opts.throttle_rate)
+    server = start_server(stand_in)
+    workdir = tempfile.mkdtemp(prefix="tradecli-bench-")
+    os.chdir(workdir)
+    import main as tradecli
+    tradecli.ALPHA_VANTAGE_URL = server_url(server)
+    tradecli.AV_THROTTLE_PAUSE = opts.throttle_pause
+    if opts.av_per_minute:
+        tradecli.av_limiter = tradecli.RateLimiter(opts.av_per_minute, tradecli.AV_BURST)
+    else:
+        tradecli.av_limiter = tradecli.RateLimiter(1e9, 1_000_000)
+
+    results = []
+    for size in (int(s) for s in opts.sizes.split(',')):
+        for name in opts.scenarios.split(','):
+            results.append(run_case(tradecli, stand_in, workdir, name.strip(), size, opts.reps, opts.warm))
+            print(f"  {name} x{size}: p50 {results[-1]['p50_ms']} ms", file=sys.stderr)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print(f"latency {opts.latency * 1000:.0f}±{opts.jitter * 1000:.0f} ms, errors {opts.error_rate:.0%}, "
+          f"throttles {opts.throttle_rate:.0%}, {'warm' if opts.warm else 'cold'} caches, {opts.reps} runs each")
+    print_table(results, baseline)
+    if output:
+        config = {k: v for k, v in vars(opts).items() if k not in ('json', 'baseline')}
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'results': results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
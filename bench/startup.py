@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAUNCHER = os.path.join(ROOT, "tradecli.py")
+
+# Time from process launch to the TradeCLI> prompt, in milliseconds. Runs above this fail.
+STARTUP_BUDGET_MS = 100.0
+PROMPT = b"TradeCLI> "
+
+
+def launch_command(script: bool):
+    # Both run main from cached bytecode; "python main.py" would recompile the whole file on every launch.
+    return [sys.executable, LAUNCHER] if script else [sys.executable, "-m", "main"]
+
+
+def time_to_prompt(workdir: str, script: bool = False) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen(launch_command(script), cwd=workdir, env=dict(os.environ, PYTHONPATH=ROOT),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # Accept the default trading mode, then leave as soon as the prompt is up.
+    proc.stdin.write(b"\nexit\n")
+    proc.stdin.flush()
+    seen = b""
+    while PROMPT not in seen:
+        chunk = os.read(proc.stdout.fileno(), 4096)
+        if not chunk:
+            proc.wait()
+            raise RuntimeError("TradeCLI exited before showing a prompt")
+        seen += chunk
+    elapsed = (time.perf_counter() - start) * 1000
+    proc.communicate()
+    return elapsed
+
+
+def interpreter_baseline() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def import_profile(workdir: str, top: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=workdir,
+                            env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        try:
+            self_us, cumulative_us, name = (part.strip() for part in line[12:].split("|"))
+            rows.append((int(cumulative_us), int(self_us), name))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    print("Slowest imports (cumulative ms, self ms):")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TradeCLI time to prompt.")
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_MS, help="fail above this median (ms)")
+    parser.add_argument("--script", action="store_true", help="launch as 'python tradecli.py' instead of 'python -m main'")
+    parser.add_argument("--imports", type=int, default=0, metavar="N", help="also list the N slowest imports")
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        time_to_prompt(workdir, opts.script)  # warms the OS file cache and writes main's bytecode
+        samples = sorted(time_to_prompt(workdir, opts.script) for _ in range(opts.runs))
+        baseline = statistics.median(interpreter_baseline() for _ in range(5))
+        median = statistics.median(samples)
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        launch = ' '.join(launch_command(opts.script)[1:])
+        print(f"{launch}: time to prompt median {median:.1f} ms, p90 {p90:.1f} ms, min {samples[0]:.1f} ms "
+              f"over {opts.runs} runs (bare interpreter {baseline:.1f} ms)")
+        if opts.imports:
+            import_profile(workdir, opts.imports)
+    if median > opts.budget:
+        print(f"FAIL: median exceeds the {opts.budget:.0f} ms budget")
+        sys.exit(1)
+    print(f"OK: within the {opts.budget:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import datetime
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+GREEN = "\033[92m"
+RED = "\033[91m"
+RESET = "\033[0m"
+LABEL_WIDTH = 10
+VOLUME_BLOCKS = np.array(list(" ▁▂▃▄▅▆▇█"))
+
+
+def _array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def columns(rows) -> Tuple[np.ndarray, ...]:
+    # Stored (ts, open, high, low, close, volume) rows as six column arrays.
+    data = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    return (data[:, 0].astype(np.int64),) + tuple(data[:, i] for i in range(1, 6))
+
+
+def bucket_starts(n: int, buckets: int) -> np.ndarray:
+    # First index of each of `buckets` near-equal runs over n points (n > buckets).
+    return (np.arange(buckets, dtype=np.int64) * n) // buckets
+
+
+def bucket_ohlcv(stamps, open_, high, low, close, volume, buckets: int) -> Tuple[np.ndarray, ...]:
+    # One pass per column: first open, max high, min low, last close and summed volume, so no
+    # extreme inside a bucket is lost however many bars it covers.
+    stamps, open_, high, low, close, volume = (np.asarray(stamps, dtype=np.int64), _array(open_), _array(high),
+                                               _array(low), _array(close), _array(volume))
+    n = len(close)
+    if n <= buckets:
+        return stamps, open_, high, low, close, volume
+    starts = bucket_starts(n, buckets)
+    ends = np.append(starts[1:], n) - 1
+    return (stamps[starts], open_[starts], np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts),
+            close[ends], np.add.reduceat(volume, starts))
+
+
+def lttb(values, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual shape of the
+    # series. Bucket means are computed in one vectorized pass; only the per-bucket argmax loops.
+    y = _array(values)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    bounds = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    bounds[-1] = n - 1
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x[1:n - 1], bounds[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1:n - 1], bounds[:-1] - 1) / counts
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _stamp(ts: int, intraday: bool) -> str:
+    moment = datetime.datetime.fromtimestamp(int(ts), datetime.timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M" if intraday else "%Y-%m-%d")
+
+
+def _time_axis(stamps: Optional[np.ndarray], width: int) -> str:
+    if stamps is None or not len(stamps):
+        return " " * (LABEL_WIDTH + 1) + ''.join(str((i // 10) % 10) if i % 10 == 0 else ' ' for i in range(width))
+    intraday = bool(np.any(np.asarray(stamps) % 86400))
+    first, middle, last = (_stamp(stamps[i], intraday) for i in (0, len(stamps) // 2, len(stamps) - 1))
+    line = [' '] * width
+    for text, at in ((first, 0), (middle, (width - len(middle)) // 2), (last, width - len(last))):
+        if at >= 0 and all(c == ' ' for c in line[max(0, at - 1):at + len(text) + 1]):
+            line[at:at + len(text)] = text
+    return " " * (LABEL_WIDTH + 1) + ''.join(line).rstrip()
+
+
+def _rows(levels: np.ndarray, height: int, low: float, high: float) -> np.ndarray:
+    span = high - low
+    if span <= 0:
+        return np.full(len(levels), height // 2, dtype=np.int64)
+    return np.clip(np.rint((levels - low) / span * (height - 1)), 0, height - 1).astype(np.int64)
+
+
+def _paint(cells: np.ndarray, colours: Optional[Sequence[str]]) -> str:
+    # One row of characters, with a colour code only where the colour of a drawn cell changes.
+    if colours is None:
+        return ''.join(cells.tolist())
+    out: List[str] = []
+    current = ''
+    for char, colour in zip(cells.tolist(), colours):
+        if char != ' ' and colour != current:
+            out.append(colour)
+            current = colour
+        out.append(char)
+    if current:
+        out.append(RESET)
+    return ''.join(out)
+
+
+def render_candles(title: str, stamps, open_, high, low, close, volume, width: int = 80, height: int = 16,
+                   volume_height: int = 4, colour: bool = True) -> str:
+    columns = max(10, width - LABEL_WIDTH - 1)
+    total = len(close)
+    stamps, open_, high, low, close, volume = bucket_ohlcv(stamps, open_, high, low, close, volume, columns)
+    count = len(close)
+    bottom, top = float(low.min()), float(high.max())
+    levels = np.arange(height)[:, None]
+    wick = (levels >= _rows(low, height, bottom, top)) & (levels <= _rows(high, height, bottom, top))
+    body = ((levels >= _rows(np.minimum(open_, close), height, bottom, top)) &
+            (levels <= _rows(np.maximum(open_, close), height, bottom, top)))
+    cells = np.where(body, '█', np.where(wick, '│', ' '))
+    colours = np.where(close >= open_, GREEN, RED).tolist() if colour else None
+    step = (top - bottom) / (height - 1) if height > 1 else 0.0
+    lines = [f"\n{title}:"]
+    for r in range(height - 1, -1, -1):
+        label = f"{bottom + step * r:9.2f} |" if r % 4 == (height - 1) % 4 or r == 0 else " " * 9 + " |"
+        lines.append(label + _paint(cells[r], colours))
+    if volume_height > 0 and volume.max() > 0:
+        scaled = volume / volume.max() * volume_height
+        fill = np.clip(scaled - np.arange(volume_height)[:, None], 0.0, 1.0)
+        blocks = VOLUME_BLOCKS[np.rint(fill * 8).astype(np.int64)]
+        for r in range(volume_height - 1, -1, -1):
+            label = f"{_volume(volume.max()):>9} |" if r == volume_height - 1 else " " * 9 + " |"
+            lines.append(label + _paint(blocks[r], colours))
+    lines.append(" " * 9 + " +" + "-" * count)
+    lines.append(_time_axis(stamps, count))
+    per = total / count if count else 0
+    lines.append(f"Open {open_[0]:.2f}  High {top:.2f}  Low {bottom:.2f}  Close {close[-1]:.2f}  "
+                 f"({total} bars, {per:.1f} per candle)")
+    return "\n".join(lines) + "\n"
+
+
+def _volume(value: float) -> str:
+    for unit, size in (('B', 1e9), ('M', 1e6), ('K', 1e3)):
+        if value >= size:
+            return f"{value / size:.1f}{unit}"
+    return f"{value:.0f}"
+
+
+def render_line(title: str, values, overlays=(), width: int = 80, height: int = 10, stamps=None) -> str:
+    # Overlays are (series, mark) pairs aligned with values; NaNs are left blank.
+    y = _array(values)
+    columns = max(10, width - LABEL_WIDTH - 1)
+    picked = lttb(y, columns)
+    n = len(y)
+    cols = np.rint(picked * (columns - 1) / (n - 1)).astype(np.int64) if n > columns else np.arange(n)
+    count = int(cols[-1]) + 1 if len(cols) else 0
+    layers = [(_array(series)[picked], mark) for series, mark in overlays] + [(y[picked], '*')]
+    visible = np.concatenate([series[~np.isnan(series)] for series, _ in layers])
+    bottom, top = float(visible.min()), float(visible.max())
+    step = (top - bottom) / (height - 1) if top != bottom else 1.0
+    grid = np.full((height, count), ' ')
+    for series, mark in layers:
+        ok = ~np.isnan(series)
+        grid[height - 1 - _rows(series[ok], height, bottom, top), cols[ok]] = mark
+    lines = [f"\n{title}:"]
+    for r in range(height):
+        lines.append(f"{bottom + step * (height - 1 - r):9.2f} |" + ''.join(grid[r].tolist()))
+    lines.append(" " * 9 + " +" + "-" * count)
+    lines.append(_time_axis(None if stamps is None else np.asarray(stamps)[picked], count))
+    shown = f"  ({len(picked)} of {n} points)" if n > len(picked) else ""
+    lines.append(f"Min: {bottom:.2f}  Max: {top:.2f}{shown}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,201 @@
+import csv
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Column types: 'f' float64, 'i' int64, 's' utf-8 text.
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.col': 'col'}
+ROW_GROUP = 8192
+
+COLUMNAR_MAGIC = b"TCOL1\n"
+_COUNT = struct.Struct("<I")
+_TYPES = {'f': float, 'i': int, 's': str}
+
+
+def format_for(path: str, default: str = 'csv') -> str:
+    return FORMATS.get(os.path.splitext(path)[1].lower(), default)
+
+
+def _check(columns: Sequence[str], types: str, row: Sequence) -> Optional[str]:
+    # Problems the converters would let through: JSON nulls and missing keys, which str() turns into
+    # 'None', and fractional JSON numbers, which int() truncates.
+    for column, kind, value in zip(columns, types, row):
+        if value is None:
+            return f"missing {column}"
+        if kind == 'i' and isinstance(value, float) and not value.is_integer():
+            return f"{column} is not a whole number: {value!r}"
+    return None
+
+
+def _convert(types: str, row: Sequence) -> tuple:
+    return tuple(_TYPES[t](v) for t, v in zip(types, row))
+
+
+def _write_csv(f, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def _write_jsonl(f, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(columns, row))))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def _encode_column(kind: str, values: list) -> bytes:
+    if kind == 's':
+        encoded = [v.encode('utf-8') for v in values]
+        lengths = array('I', map(len, encoded))
+        if sys.byteorder != 'little':
+            lengths.byteswap()
+        return lengths.tobytes() + b"".join(encoded)
+    column = array('d' if kind == 'f' else 'q', values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+
+def _write_group(f, types: str, group: List[tuple]):
+    f.write(_COUNT.pack(len(group)))
+    for i, kind in enumerate(types):
+        data = _encode_column(kind, [row[i] for row in group])
+        f.write(_COUNT.pack(len(data)))
+        f.write(data)
+
+
+def _write_columnar(f, columns: Sequence[str], types: str, rows: Iterable[tuple]) -> int:
+    # Header, then row groups of up to ROW_GROUP rows stored column by column.
+    header = json.dumps({'columns': list(columns), 'types': types}).encode('utf-8')
+    f.write(COLUMNAR_MAGIC + _COUNT.pack(len(header)) + header)
+    count = 0
+    group: List[tuple] = []
+    for row in rows:
+        group.append(row)
+        if len(group) == ROW_GROUP:
+            _write_group(f, types, group)
+            count += len(group)
+            group = []
+    if group:
+        _write_group(f, types, group)
+        count += len(group)
+    return count
+
+
+def write_rows(path: str, columns: Sequence[str], types: str, rows: Iterable[tuple], fmt: str = None) -> int:
+    # Rows are consumed one at a time and written through; a partial file never replaces a good one.
+    fmt = fmt or format_for(path)
+    tmp = path + ".tmp"
+    try:
+        if fmt == 'col':
+            with open(tmp, 'wb') as f:
+                count = _write_columnar(f, columns, types, rows)
+        else:
+            with open(tmp, 'w', newline='' if fmt == 'csv' else None, encoding='utf-8') as f:
+                count = _write_csv(f, columns, rows) if fmt == 'csv' else _write_jsonl(f, columns, rows)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated columnar file")
+    return data
+
+
+def _decode_column(kind: str, data: bytes, count: int) -> list:
+    if kind == 's':
+        lengths = array('I')
+        lengths.frombytes(data[:4 * count])
+        if sys.byteorder != 'little':
+            lengths.byteswap()
+        values, offset = [], 4 * count
+        for length in lengths:
+            values.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return values
+    column = array('d' if kind == 'f' else 'q')
+    column.frombytes(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tolist()
+
+
+def _read_columnar(f) -> Iterator[tuple]:
+    size, = _COUNT.unpack(_read_exact(f, 4))
+    header = json.loads(_read_exact(f, size))
+    types = header['types']
+    yield tuple(header['columns'])
+    while True:
+        head = f.read(4)
+        if not head:
+            return
+        if len(head) != 4:
+            raise ValueError("truncated columnar file")
+        count, = _COUNT.unpack(head)
+        columns = []
+        for kind in types:
+            size, = _COUNT.unpack(_read_exact(f, 4))
+            columns.append(_decode_column(kind, _read_exact(f, size), count))
+        yield from zip(*columns)
+
+
+def read_rows(path: str, columns: Sequence[str], types: str,
+              fmt: str = None) -> Iterator[Tuple[int, Optional[tuple], Optional[str]]]:
+    # Yields (row number, converted row, None), or (row number, None, error) for a row that cannot be
+    # converted, so callers can validate a whole file before applying any of it.
+    fmt = fmt or format_for(path)
+    if fmt == 'col':
+        f = open(path, 'rb')
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            f.close()
+            raise ValueError(f"{path} is not a columnar export")
+        rows = _read_columnar(f)
+    else:
+        f = open(path, 'r', newline='' if fmt == 'csv' else None, encoding='utf-8')
+        rows = csv.reader(f) if fmt == 'csv' else f
+    with f:
+        header = None
+        for number, row in enumerate(rows, 1 if fmt == 'jsonl' else 0):
+            if fmt == 'jsonl':
+                if not row.strip():
+                    continue
+                try:
+                    record = json.loads(row)
+                    row = tuple(record.get(c) for c in columns)
+                except (ValueError, AttributeError):
+                    yield number, None, f"row {number}: not a JSON object"
+                    continue
+            elif header is None:
+                header = tuple(row)
+                if header != tuple(columns):
+                    raise ValueError(f"expected columns {', '.join(columns)}, got {', '.join(header)}")
+                continue
+            if len(row) != len(columns):
+                yield number, None, f"row {number}: expected {len(columns)} values, got {len(row)}"
+                continue
+            problem = _check(columns, types, row)
+            if problem:
+                yield number, None, f"row {number}: {problem}"
+                continue
+            try:
+                yield number, _convert(types, row), None
+            except (TypeError, ValueError):
+                yield number, None, f"row {number}: cannot read {row!r}"
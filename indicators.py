@@ -0,0 +1,313 @@
+import math
+from collections import deque
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def _array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def ewm(values, alpha: float, initial: Optional[float] = None) -> np.ndarray:
+    # y[t] = (1 - alpha) * y[t-1] + alpha * x[t], solved in closed form one block at a time.
+    x = _array(values)
+    out = np.empty_like(x)
+    if not len(x):
+        return out
+    decay = 1.0 - alpha
+    prev = x[0] if initial is None else initial
+    if decay <= 0.0:
+        out[:] = x
+        return out
+    # Blocks stay short enough that decay ** -block cannot overflow.
+    block = len(x) if decay == 1.0 else max(1, min(len(x), int(150 * math.log(10) / -math.log(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        p = powers[:len(chunk)]
+        out[start:start + len(chunk)] = p * (prev + alpha * np.cumsum(chunk / p))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def sma(values, window: int) -> np.ndarray:
+    x = _array(values)
+    out = np.full(len(x), np.nan)
+    if window <= 0 or len(x) < window:
+        return out
+    csum = np.cumsum(np.insert(x, 0, 0.0))
+    out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def ema(values, span: int) -> np.ndarray:
+    return ewm(values, 2.0 / (span + 1))
+
+
+def rolling_std(values, window: int) -> np.ndarray:
+    x = _array(values)
+    out = np.full(len(x), np.nan)
+    if window <= 1 or len(x) < window:
+        return out
+    centred = x - x.mean()
+    c1 = np.cumsum(np.insert(centred, 0, 0.0))
+    c2 = np.cumsum(np.insert(centred * centred, 0, 0.0))
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    var = (s2 - s1 * s1 / window) / (window - 1)
+    out[window - 1:] = np.sqrt(np.maximum(var, 0.0))
+    return out
+
+
+def bollinger(values, window: int = 20, width: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    mid = sma(values, window)
+    band = rolling_std(values, window) * width
+    return mid - band, mid, mid + band
+
+
+def _wilder(values, period: int) -> np.ndarray:
+    # Seeded with the simple mean of the first `period` values, then smoothed with alpha = 1/period.
+    x = _array(values)
+    out = np.full(len(x), np.nan)
+    if len(x) < period:
+        return out
+    seed = x[:period].mean()
+    out[period - 1] = seed
+    out[period:] = ewm(x[period:], 1.0 / period, seed)
+    return out
+
+
+def rsi(closes, period: int = 14) -> np.ndarray:
+    x = _array(closes)
+    out = np.full(len(x), np.nan)
+    if len(x) <= period:
+        return out
+    delta = np.diff(x)
+    gains = _wilder(np.maximum(delta, 0.0), period)
+    losses = _wilder(np.maximum(-delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = gains / losses
+        values = 100.0 - 100.0 / (1.0 + rs)
+    values = np.where(losses == 0, np.where(gains == 0, 50.0, 100.0), values)
+    out[1:] = np.where(np.isnan(gains), np.nan, values)
+    return out
+
+
+def true_range(high, low, close) -> np.ndarray:
+    h, l, c = _array(high), _array(low), _array(close)
+    prev = np.concatenate(([c[0]], c[:-1])) if len(c) else c
+    return np.maximum(h - l, np.maximum(np.abs(h - prev), np.abs(l - prev)))
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    return _wilder(true_range(high, low, close), period)
+
+
+def realized_volatility(closes_by_ticker: Dict[str, Sequence[float]], window: int = 20,
+                        periods_per_year: int = TRADING_DAYS) -> Dict[str, float]:
+    # Tickers with enough history are stacked into one (tickers x window+1) matrix and reduced together.
+    ready = [(t, c) for t, c in closes_by_ticker.items() if len(c) > window]
+    if not ready:
+        return {}
+    matrix = np.vstack([_array(c[-(window + 1):]) for _, c in ready])
+    vols = np.diff(np.log(matrix), axis=1).std(axis=1, ddof=1) * math.sqrt(periods_per_year)
+    return {t: float(v) for (t, _), v in zip(ready, vols)}
+
+
+class RollingMean:
+    __slots__ = ('window', 'values', 'total')
+
+    def __init__(self, window: int, history: Sequence[float] = ()):
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self.total = 0.0
+        for x in history[-window:]:
+            self.update(x)
+
+    def update(self, x: float) -> Optional[float]:
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+        return self.value
+
+    def peek(self, x: float) -> Optional[float]:
+        if len(self.values) + 1 < self.window:
+            return None
+        drop = self.values[0] if len(self.values) == self.window else 0.0
+        return (self.total - drop + x) / self.window
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.total / self.window if len(self.values) == self.window else None
+
+
+class RollingStd:
+    __slots__ = ('window', 'values', 'total', 'squares')
+
+    def __init__(self, window: int, history: Sequence[float] = ()):
+        self.window = window
+        self.values: deque = deque(maxlen=window)
+        self.total = 0.0
+        self.squares = 0.0
+        for x in history[-window:]:
+            self.update(x)
+
+    def _std(self, total: float, squares: float) -> float:
+        return math.sqrt(max(0.0, (squares - total * total / self.window) / (self.window - 1)))
+
+    def update(self, x: float) -> Optional[float]:
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.total -= old
+            self.squares -= old * old
+        self.values.append(x)
+        self.total += x
+        self.squares += x * x
+        return self.value
+
+    def peek(self, x: float) -> Optional[float]:
+        if len(self.values) + 1 < self.window:
+            return None
+        old = self.values[0] if len(self.values) == self.window else 0.0
+        return self._std(self.total - old + x, self.squares - old * old + x * x)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._std(self.total, self.squares) if len(self.values) == self.window else None
+
+
+class EMAState:
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, span: int, history: Sequence[float] = ()):
+        self.alpha = 2.0 / (span + 1)
+        self.value: Optional[float] = float(ema(history, span)[-1]) if len(history) else None
+
+    def update(self, x: float) -> float:
+        self.value = self.peek(x)
+        return self.value
+
+    def peek(self, x: float) -> float:
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+
+class RSIState:
+    __slots__ = ('period', 'prev', 'gain', 'loss', 'seen')
+
+    def __init__(self, period: int = 14, history: Sequence[float] = ()):
+        self.period = period
+        self.prev: Optional[float] = None
+        self.gain = 0.0
+        self.loss = 0.0
+        self.seen = 0
+        if len(history) > period:
+            x = _array(history)
+            delta = np.diff(x)
+            self.gain = float(_wilder(np.maximum(delta, 0.0), period)[-1])
+            self.loss = float(_wilder(np.maximum(-delta, 0.0), period)[-1])
+            self.seen = len(delta)
+            self.prev = float(x[-1])
+        else:
+            for c in history:
+                self.update(c)
+
+    def _step(self, close: float) -> Tuple[float, float, int]:
+        change = close - self.prev
+        up, down = max(change, 0.0), max(-change, 0.0)
+        seen = self.seen + 1
+        if seen <= self.period:
+            return self.gain + up / self.period, self.loss + down / self.period, seen
+        return self.gain + (up - self.gain) / self.period, self.loss + (down - self.loss) / self.period, seen
+
+    @staticmethod
+    def _rsi(gain: float, loss: float) -> float:
+        if loss == 0:
+            return 50.0 if gain == 0 else 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def update(self, close: float) -> Optional[float]:
+        if self.prev is not None:
+            self.gain, self.loss, self.seen = self._step(close)
+        self.prev = close
+        return self.value
+
+    def peek(self, close: float) -> Optional[float]:
+        if self.prev is None:
+            return None
+        gain, loss, seen = self._step(close)
+        return self._rsi(gain, loss) if seen >= self.period else None
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._rsi(self.gain, self.loss) if self.seen >= self.period else None
+
+
+class ATRState:
+    __slots__ = ('period', 'prev_close', 'value', 'seen')
+
+    def __init__(self, period: int = 14, bars: Sequence[Tuple[float, float, float]] = ()):
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.value = 0.0
+        self.seen = 0
+        if len(bars) >= period:
+            h, l, c = (np.asarray(col, dtype=np.float64) for col in zip(*bars))
+            self.value = float(atr(h, l, c, period)[-1])
+            self.seen = len(bars)
+            self.prev_close = float(c[-1])
+        else:
+            for bar in bars:
+                self.update(*bar)
+
+    def _step(self, high: float, low: float, close: float) -> Tuple[float, int]:
+        prev = close if self.prev_close is None else self.prev_close
+        tr = max(high - low, abs(high - prev), abs(low - prev))
+        seen = self.seen + 1
+        if seen <= self.period:
+            return self.value + (tr - self.value) / seen, seen
+        return self.value + (tr - self.value) / self.period, seen
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        self.value, self.seen = self._step(high, low, close)
+        self.prev_close = close
+        return self.current
+
+    def peek(self, high: float, low: float, close: float) -> Optional[float]:
+        value, seen = self._step(high, low, close)
+        return value if seen >= self.period else None
+
+    @property
+    def current(self) -> Optional[float]:
+        return self.value if self.seen >= self.period else None
+
+
+class VolatilityState:
+    __slots__ = ('periods_per_year', 'prev', 'returns')
+
+    def __init__(self, window: int = 20, history: Sequence[float] = (), periods_per_year: int = TRADING_DAYS):
+        self.periods_per_year = periods_per_year
+        self.prev: Optional[float] = None
+        self.returns = RollingStd(window)
+        for c in history[-(window + 1):]:
+            self.update(c)
+
+    def update(self, close: float) -> Optional[float]:
+        if self.prev is not None and self.prev > 0 and close > 0:
+            self.returns.update(math.log(close / self.prev))
+        self.prev = close
+        return self.value
+
+    def peek(self, close: float) -> Optional[float]:
+        if self.prev is None or self.prev <= 0 or close <= 0:
+            return self.value
+        std = self.returns.peek(math.log(close / self.prev))
+        return None if std is None else std * math.sqrt(self.periods_per_year)
+
+    @property
+    def value(self) -> Optional[float]:
+        std = self.returns.value
+        return None if std is None else std * math.sqrt(self.periods_per_year)
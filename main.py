@@ -1,32 +1,115 @@
+import atexit
 import math
 import os
-import requests
 import json
 import random
+import sys
 import datetime
-from typing import Dict, List, Set
+import bisect
+import heapq
+import importlib
+import itertools
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    import requests
 
 TRADING_MODE = "dummy"
 TRADING_CONFIG: Dict[str, str] = {}
 
 GREEN = "\033[92m"
+RED = "\033[91m"
 BOLD = "\033[1m"
 RESET = "\033[0m"
+PROMPT = f"TradeCLI> {RESET}"
 
-market_data: Dict[str, Dict] = {}
+market_data: Dict[str, "PriceSeries"] = {}
 favourites: Set[str] = set()
 watchlist: Set[str] = set()
+dashboard_custom: Optional[List[str]] = None
 
 ALPHA_VANTAGE_KEY = "PKCP234ZXWY3IG2O"
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
 portfolio_history: List[float] = []
+trade_history: List[Dict] = []
 command_history: List[str] = []
 ticker_notes: Dict[str, List[str]] = {}
 
-user_profiles: Dict[str, Dict] = {}
 current_profile: str = 'default'
 macros: Dict[str, str] = {}
 last_action: Dict = {}
 
+# Seconds a cached quote counts as fresh, per asset class.
+QUOTE_TTL: Dict[str, float] = {'equity': 60.0, 'fx': 30.0, 'crypto': 15.0}
+# Past its TTL a quote is still served for this long while it refreshes in the background.
+QUOTE_MAX_STALE = 600.0
+QUOTE_CACHE_SIZE = 256
+# Price updates kept per ticker in market_data.
+HISTORY_CAPACITY = 100
+# Trades never execute against a quote older than this.
+TRADE_QUOTE_MAX_AGE = 5.0
+# Upper bound on simultaneous quote fetches made by get_market_prices.
+QUOTE_CONCURRENCY = 8
+# Seconds between refreshes of the live watch table, and the shortest tick allowed.
+WATCH_INTERVAL = 5.0
+WATCH_MIN_INTERVAL = 1.0
+
+# Shared HTTP client: (connect, read) timeouts, pool sizing and retry backoff.
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10.0
+HTTP_POOL_HOSTS = 4
+HTTP_POOL_SIZE = QUOTE_CONCURRENCY
+HTTP_RETRIES = 3
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 8.0
+
+# Alpha Vantage quota: every call waits for a token from this bucket.
+AV_REQUESTS_PER_MINUTE = 5
+AV_BURST = 5
+AV_THROTTLE_RETRIES = 3
+AV_THROTTLE_PAUSE = 60.0
+
+# Lower value wins when several calls are queued for the same token.
+PRIORITY_TRADE = 0
+PRIORITY_ALERT = 1
+PRIORITY_DASHBOARD = 2
+PRIORITY_POPULAR = 3
+
+# Local OHLCV store used by charts; bars are topped up incrementally from Alpha Vantage.
+BARS_DB = "tradecli_bars.db"
+# Alpha Vantage compact responses hold this many of the most recent bars.
+AV_COMPACT_BARS = 100
+# Seconds before stored daily bars are checked for a newer one.
+DAILY_SYNC_INTERVAL = 3600.0
+
+# Session state persistence: an append-only event journal plus periodic compacted snapshots.
+JOURNAL_FILE = "tradecli_journal.jsonl"
+SNAPSHOT_FILE = "tradecli_snapshot.json"
+LEGACY_SAVE_FILE = "portfolio_save.json"
+JOURNAL_FSYNC_EVERY = 32
+JOURNAL_FSYNC_INTERVAL = 1.0
+SNAPSHOT_EVERY = 1000
+# Unix socket of the shared daemon, in the per-user runtime directory; TRADECLI_SOCKET overrides it.
+DAEMON_SOCKET = "tradecli.sock"
+# Profiles other than 'default' keep their journal and snapshot in PROFILE_DIR/<name>.
+DEFAULT_PROFILE = 'default'
+PROFILE_DIR = "tradecli_profiles"
+ACTIVE_PROFILE_FILE = os.path.join(PROFILE_DIR, "active")
+
+# Default and minimum seconds between background polls of an alert's ticker.
+ALERT_POLL_INTERVAL = 60.0
+ALERT_MIN_INTERVAL = 5.0
+
+FX_CURRENCIES = {"USD", "EUR", "GBP", "JPY", "AUD", "NZD", "CAD", "CHF", "CNY", "HKD", "SGD", "SEK", "NOK", "DKK", "INR", "MXN", "ZAR"}
+CRYPTO_SYMBOLS = {"BTC", "ETH", "SOL", "XRP", "ADA", "DOGE", "LTC", "BNB", "DOT", "AVAX", "LINK", "MATIC"}
+
 
 def configure_real_trading():
     print("Enter credentials for real trading platform:")
@@ -37,101 +120,906 @@ def configure_real_trading():
     print("Real trading configuration saved.")
 
 
-def fetch_alpha_vantage_price(ticker: str) -> float:
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={ALPHA_VANTAGE_KEY}"
+# Upper bounds, in seconds, of the fixed histogram buckets; the last bucket catches everything above.
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(METRIC_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(METRIC_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        # Interpolated within the bucket holding the q-th observation, capped at the largest value seen.
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(METRIC_BUCKETS, self.counts):
+            if n and seen + n >= rank:
+                return min(lower + (bound - lower) * (rank - seen) / n, self.max)
+            seen += n
+            lower = bound
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {'count': self.count, 'sum': round(self.total, 6), 'max': round(self.max, 6),
+                'p50': round(self.quantile(0.5), 6), 'p90': round(self.quantile(0.9), 6),
+                'p99': round(self.quantile(0.99), 6),
+                'buckets': dict(zip([str(b) for b in METRIC_BUCKETS] + ['+Inf'], self.counts))}
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = True
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str], int] = {}
+        # Seconds spent in HTTP calls on any thread; commands record their share as a difference.
+        self.network_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, metric: str, label: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get((metric, label))
+            if histogram is None:
+                histogram = self.histograms[(metric, label)] = Histogram()
+            histogram.observe(seconds)
+            if metric == 'http':
+                self.network_seconds += seconds
+
+    def count(self, metric: str, label: str = '', n: int = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[(metric, label)] = self.counters.get((metric, label), 0) + n
+
+    def counter(self, metric: str, label: str = '') -> int:
+        return self.counters.get((metric, label), 0)
+
+    def labels(self, metric: str) -> List[str]:
+        with self._lock:
+            return sorted({label for m, label in self.histograms if m == metric} |
+                          {label for m, label in self.counters if m == metric})
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.network_seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            data: Dict[str, Dict] = {}
+            for (metric, label), histogram in self.histograms.items():
+                data.setdefault(metric + '_seconds', {})[label] = histogram.to_dict()
+            for (metric, label), value in self.counters.items():
+                data.setdefault(metric + '_total', {})[label] = value
+            return data
+
+    def prometheus(self) -> str:
+        lines = []
+        for name, series in sorted(self.to_dict().items()):
+            metric = 'tradecli_' + name
+            kind = 'histogram' if name.endswith('_seconds') else 'counter'
+            lines.append(f"# TYPE {metric} {kind}")
+            for label, value in sorted(series.items()):
+                tag = f'label="{label}"' if label else ''
+                labels = f"{{{tag}}}" if tag else ''
+                if kind == 'counter':
+                    lines.append(f"{metric}{labels} {value}")
+                    continue
+                cumulative = 0
+                for bound, n in value['buckets'].items():
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{{{tag + ',' if tag else ''}le=\"{bound}\"}} {cumulative}")
+                lines.append(f"{metric}_sum{labels} {value['sum']}")
+                lines.append(f"{metric}_count{labels} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# requests is imported with the first HTTP call so commands that never touch the network start fast.
+_http_session: Optional["requests.Session"] = None
+_http_session_lock = threading.Lock()
+
+
+def http_session() -> "requests.Session":
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["User-Agent"] = "TradeCLI"
+                _http_session = session
+    return _http_session
+
+
+def backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+
+def http_request(method: str, url: str, timeout=None, retries: Optional[int] = None, **kwargs) -> "requests.Response":
+    import requests
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if retries is None:
+        retries = HTTP_RETRIES
+    endpoint = (kwargs.get('params') or {}).get('function') or url.split('/')[2]
+    attempt = 0
+    while True:
+        metrics.count('http_requests', endpoint)
+        started = time.perf_counter()
+        try:
+            resp = http_session().request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.observe('http', endpoint, time.perf_counter() - started)
+            metrics.count('http_errors', endpoint)
+            if attempt >= retries:
+                raise
+        else:
+            metrics.observe('http', endpoint, time.perf_counter() - started)
+            if resp.status_code < 500:
+                return resp
+            metrics.count('http_errors', endpoint)
+            if attempt >= retries:
+                return resp
+            resp.close()
+        metrics.count('http_retries', endpoint)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def http_get(url: str, **kwargs) -> "requests.Response":
+    return http_request("GET", url, **kwargs)
+
+
+def http_post(url: str, **kwargs) -> "requests.Response":
+    return http_request("POST", url, **kwargs)
+
+
+class RateLimiter:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, priority: int = PRIORITY_DASHBOARD):
+        key = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, key)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] == key:
+                        if self.tokens >= 1 and now >= self.paused_until:
+                            heapq.heappop(self._waiters)
+                            self.tokens -= 1
+                            self._cond.notify_all()
+                            return
+                        wait = max(self.paused_until - now, (1 - self.tokens) / self.rate if self.rate else 1.0)
+                        self._cond.wait(max(wait, 0.01))
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                if key in self._waiters:
+                    self._waiters.remove(key)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+av_limiter = RateLimiter(AV_REQUESTS_PER_MINUTE, AV_BURST)
+_av_inflight: Dict[Tuple, Tuple["Future", int]] = {}
+_av_inflight_lock = threading.Lock()
+
+
+def alpha_vantage_throttle(data) -> Optional[str]:
+    if not isinstance(data, dict):
+        return None
+    message = data.get("Note") or data.get("Information")
+    if not message or "Global Quote" in data or any(k.startswith("Time Series") for k in data):
+        return None
+    message = message.lower()
+    # The per-minute Note also quotes the daily quota, so it is recognised first.
+    if "frequency" in message or "per minute" in message:
+        return 'minute'
+    if "per day" in message or "daily" in message:
+        return 'day'
+    if "rate limit" in message:
+        return 'minute'
+    return None
+
+
+def fetch_warning(message: str):
+    # A command prints its own fetch errors. Fetches on background threads (stale refreshes, the alert
+    # monitor, watch) go through notify, so they never break into the prompt, the watch screen or
+    # another daemon client's output.
+    if active_snapshot() is not None:
+        print(message)
+    else:
+        notify(message)
+
+
+def _alpha_vantage_call(params: Dict[str, str], priority: int) -> Optional[Dict]:
+    params = dict(params, apikey=ALPHA_VANTAGE_KEY)
+    for _ in range(AV_THROTTLE_RETRIES + 1):
+        started = time.perf_counter()
+        av_limiter.acquire(priority)
+        metrics.observe('limiter_wait', '', time.perf_counter() - started)
+        data = http_get(ALPHA_VANTAGE_URL, params=params).json()
+        throttle = alpha_vantage_throttle(data)
+        if throttle is None:
+            return data
+        metrics.count('av_throttled', throttle)
+        if throttle == 'day':
+            fetch_warning("Alpha Vantage: daily request limit reached.")
+            return None
+        av_limiter.pause(AV_THROTTLE_PAUSE)
+    fetch_warning(f"Alpha Vantage: still rate limited after {AV_THROTTLE_RETRIES} retries.")
+    return None
+
+
+def alpha_vantage_query(params: Dict[str, str], priority: int = PRIORITY_DASHBOARD) -> Optional[Dict]:
+    key = tuple(sorted(params.items()))
+    with _av_inflight_lock:
+        entry = _av_inflight.get(key)
+        # Joining a call queued at a lower priority would leave this caller waiting behind it, so a
+        # more urgent caller makes its own call, which later callers then join instead.
+        owner = entry is None or priority < entry[1]
+        if owner:
+            from concurrent.futures import Future
+            future = Future()
+            _av_inflight[key] = (future, priority)
+        else:
+            future = entry[0]
+    if not owner:
+        metrics.count('av_coalesced')
+        return future.result()
+    try:
+        result = _alpha_vantage_call(params, priority)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _av_inflight_lock:
+            if _av_inflight.get(key, (None,))[0] is future:
+                del _av_inflight[key]
+
+
+def fetch_alpha_vantage_price(ticker: str, priority: int = PRIORITY_DASHBOARD) -> float:
     try:
-        r = requests.get(url, timeout=10)
-        data = r.json()
+        data = alpha_vantage_query({"function": "GLOBAL_QUOTE", "symbol": ticker}, priority)
+        if data is None:
+            return 0.0
         price = data.get("Global Quote", {}).get("05. price")
         if price:
             return round(float(price), 2)
         else:
-            print(f"Alpha Vantage: No price for {ticker}.")
+            fetch_warning(f"Alpha Vantage: No price for {ticker}.")
             return 0.0
     except Exception as e:
-        print(f"Alpha Vantage error: {e}")
+        fetch_warning(f"Alpha Vantage error: {e}")
         return 0.0
 
 
-def get_market_price(ticker: str) -> float:
+def asset_class(ticker: str) -> str:
+    ticker = ticker.upper()
+    if len(ticker) == 6 and ticker[:3] in FX_CURRENCIES and ticker[3:] in FX_CURRENCIES:
+        return 'fx'
+    if ticker[-3:] in FX_CURRENCIES and ticker[:-3] in CRYPTO_SYMBOLS:
+        return 'crypto'
+    return 'equity'
+
+
+class QuoteCache:
+    def __init__(self, max_size: int = QUOTE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str) -> Optional[Tuple[float, float]]:
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None:
+                self._entries.move_to_end(ticker)
+            return entry
+
+    def put(self, ticker: str, price: float):
+        with self._lock:
+            self._entries[ticker] = (price, time.time())
+            self._entries.move_to_end(ticker)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def begin_refresh(self, ticker: str) -> bool:
+        with self._lock:
+            if ticker in self._refreshing:
+                return False
+            self._refreshing.add(ticker)
+            return True
+
+    def end_refresh(self, ticker: str):
+        with self._lock:
+            self._refreshing.discard(ticker)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+quote_cache = QuoteCache()
+
+
+class PriceSnapshot:
+    def __init__(self):
+        self.prices: Dict[str, float] = {}
+        self.fetches = 0
+
+
+_snapshot_local = threading.local()
+last_snapshot: Optional[PriceSnapshot] = None
+
+
+def active_snapshot() -> Optional[PriceSnapshot]:
+    return getattr(_snapshot_local, 'snapshot', None)
+
+
+@contextmanager
+def price_snapshot():
+    global last_snapshot
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        yield snapshot
+        return
+    snapshot = PriceSnapshot()
+    _snapshot_local.snapshot = snapshot
+    try:
+        yield snapshot
+    finally:
+        _snapshot_local.snapshot = None
+        last_snapshot = snapshot
+
+
+class PriceSeries:
+    __slots__ = ('capacity', 'prices', 'times', 'start', 'size', 'updates')
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY):
+        self.capacity = capacity
+        self.prices = array('d', bytes(8 * capacity))
+        self.times = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+        self.updates = 0
+
+    def append(self, price: float, timestamp: Optional[float] = None):
+        if self.size < self.capacity:
+            i = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.prices[i] = price
+        self.times[i] = time.time() if timestamp is None else timestamp
+        self.updates += 1
+
+    def _index(self, n: int) -> int:
+        if n < 0:
+            n += self.size
+        if not 0 <= n < self.size:
+            raise IndexError("PriceSeries index out of range")
+        return (self.start + n) % self.capacity
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, n: int) -> float:
+        return self.prices[self._index(n)]
+
+    def time_at(self, n: int) -> float:
+        return self.times[self._index(n)]
+
+    @property
+    def price(self) -> float:
+        return self[-1] if self.size else 0.0
+
+    def _views(self, buf: array) -> Tuple[memoryview, memoryview]:
+        view = memoryview(buf)
+        end = self.start + self.size
+        if end <= self.capacity:
+            return view[self.start:end], view[0:0]
+        return view[self.start:], view[:end - self.capacity]
+
+    def price_views(self) -> Tuple[memoryview, memoryview]:
+        return self._views(self.prices)
+
+    def time_views(self) -> Tuple[memoryview, memoryview]:
+        return self._views(self.times)
+
+    def values(self) -> List[float]:
+        head, tail = self.price_views()
+        return head.tolist() + tail.tolist()
+
+
+class SessionAnalytics:
+    def __init__(self):
+        self.opens: Dict[str, float] = {}
+        self.lasts: Dict[str, float] = {}
+        self.changes: Dict[str, float] = {}
+        self.trending: Set[str] = set()
+        self.total_change = 0.0
+        self.wins = 0
+        self._versions: Dict[str, int] = {}
+        self._gainers: List[Tuple[float, str, int]] = []
+        self._losers: List[Tuple[float, str, int]] = []
+        self._lock = threading.Lock()
+
+    def update(self, ticker: str, price: float):
+        with self._lock:
+            previous = self.lasts.get(ticker)
+            self.lasts[ticker] = price
+            if previous is None:
+                self.opens[ticker] = price
+                return
+            if price > previous:
+                self.trending.add(ticker)
+            else:
+                self.trending.discard(ticker)
+            old = self.changes.get(ticker)
+            if old is not None:
+                self.total_change -= old
+                self.wins -= old > 0
+            change = price - self.opens[ticker]
+            self.changes[ticker] = change
+            self.total_change += change
+            self.wins += change > 0
+            version = self._versions.get(ticker, 0) + 1
+            self._versions[ticker] = version
+            if len(self._gainers) > 4 * len(self.changes) + 64:
+                self._rebuild()
+            else:
+                heapq.heappush(self._gainers, (-change, ticker, version))
+                heapq.heappush(self._losers, (change, ticker, version))
+
+    def _rebuild(self):
+        self._gainers = [(-c, t, self._versions[t]) for t, c in self.changes.items()]
+        self._losers = [(c, t, self._versions[t]) for t, c in self.changes.items()]
+        heapq.heapify(self._gainers)
+        heapq.heapify(self._losers)
+
+    def _top(self, heap: List[Tuple[float, str, int]], k: int) -> List[Tuple[float, str, int]]:
+        # Entries superseded by a newer tick are dropped as they surface; live ones are pushed back.
+        found = []
+        while heap and len(found) < k:
+            entry = heapq.heappop(heap)
+            if self._versions.get(entry[1]) == entry[2]:
+                found.append(entry)
+        for entry in found:
+            heapq.heappush(heap, entry)
+        return found
+
+    def gainers(self, k: int = 5) -> List[Tuple[float, str]]:
+        with self._lock:
+            return [(-c, t) for c, t, _ in self._top(self._gainers, k)]
+
+    def losers(self, k: int = 5) -> List[Tuple[float, str]]:
+        with self._lock:
+            return [(c, t) for c, t, _ in self._top(self._losers, k)]
+
+    def trending_up(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return [(t, self.lasts[t]) for t in self.trending]
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+
+session_analytics = SessionAnalytics()
+
+
+class PortfolioValuation:
+    def __init__(self):
+        # ticker -> [qty, cost, mark]; a holding is marked at its average cost until a quote arrives.
+        self.holdings: Dict[str, List[float]] = {}
+        self.market_value = 0.0
+        self.cost_basis = 0.0
+        self._lock = threading.RLock()
+
+    def set_position(self, ticker: str, qty: float, cost: float):
+        with self._lock:
+            old = self.holdings.pop(ticker, None)
+            if old is not None:
+                self.market_value -= old[0] * old[2]
+                self.cost_basis -= old[1]
+            if qty > 0:
+                series = market_data.get(ticker)
+                mark = old[2] if old is not None else series.price if series else cost / qty
+                self.holdings[ticker] = [qty, cost, mark]
+                self.market_value += qty * mark
+                self.cost_basis += cost
+
+    def update_price(self, ticker: str, price: float):
+        with self._lock:
+            holding = self.holdings.get(ticker)
+            if holding is not None:
+                self.market_value += holding[0] * (price - holding[2])
+                holding[2] = price
+
+    def sync(self, positions: Dict[str, Dict]):
+        with self._lock:
+            self.holdings.clear()
+            self.market_value = 0.0
+            self.cost_basis = 0.0
+            for ticker, pos in positions.items():
+                self.set_position(ticker, pos['qty'], pos['cost'])
+
+    @property
+    def unrealized(self) -> float:
+        return self.market_value - self.cost_basis
+
+    def price(self, ticker: str) -> float:
+        holding = self.holdings.get(ticker)
+        return holding[2] if holding else 0.0
+
+    def value(self, ticker: str) -> float:
+        holding = self.holdings.get(ticker)
+        return holding[0] * holding[2] if holding else 0.0
+
+    def weight(self, ticker: str) -> float:
+        return self.value(ticker) / self.market_value if self.market_value else 0.0
+
+
+portfolio_valuation = PortfolioValuation()
+
+
+def sync_position(positions: Dict[str, Dict], ticker: str):
+    pos = positions.get(ticker)
+    if pos is None:
+        portfolio_valuation.set_position(ticker, 0, 0.0)
+    else:
+        portfolio_valuation.set_position(ticker, pos['qty'], pos['cost'])
+
+
+def record_price(ticker: str, price: float, timestamp: Optional[float] = None):
+    series = market_data.get(ticker)
+    if series is None:
+        series = market_data[ticker] = PriceSeries()
+    series.append(price, timestamp)
+    session_analytics.update(ticker, price)
+    portfolio_valuation.update_price(ticker, price)
+
+
+def refresh_quote(ticker: str, priority: int = PRIORITY_DASHBOARD) -> float:
+    price = fetch_alpha_vantage_price(ticker, priority)
+    if price:
+        quote_cache.put(ticker, price)
+        record_price(ticker, price)
+    return price
+
+
+def _background_refresh(ticker: str, priority: int):
+    try:
+        refresh_quote(ticker, priority)
+    finally:
+        quote_cache.end_refresh(ticker)
+
+
+def cached_price(ticker: str, priority: int = PRIORITY_DASHBOARD, max_age: Optional[float] = None) -> Optional[float]:
+    entry = quote_cache.get(ticker)
+    if entry is None:
+        metrics.count('quote_cache', 'miss')
+        return None
+    price, fetched_at = entry
+    age = time.time() - fetched_at
+    if max_age is not None:
+        metrics.count('quote_cache', 'hit' if age < max_age else 'miss')
+        return price if age < max_age else None
+    ttl = QUOTE_TTL.get(asset_class(ticker), QUOTE_TTL['equity'])
+    if age < ttl:
+        metrics.count('quote_cache', 'hit')
+        return price
+    if age < ttl + QUOTE_MAX_STALE:
+        metrics.count('quote_cache', 'stale')
+        if quote_cache.begin_refresh(ticker):
+            threading.Thread(target=_background_refresh, args=(ticker, priority), daemon=True).start()
+        return price
+    metrics.count('quote_cache', 'miss')
+    return None
+
+
+def get_market_price(ticker: str, priority: int = PRIORITY_DASHBOARD, max_age: Optional[float] = None) -> float:
     ticker = ticker.upper()
-    price = fetch_alpha_vantage_price(ticker)
-    if ticker not in market_data:
-        market_data[ticker] = {'history': [], 'price': price}
-    data = market_data[ticker]
-    data['price'] = price
-    data['history'].append(price)
-    if len(data['history']) > 100:
-        data['history'] = data['history'][-100:]
+    snapshot = active_snapshot()
+    if snapshot is not None and ticker in snapshot.prices:
+        metrics.count('quote_cache', 'snapshot')
+        return snapshot.prices[ticker]
+    price = cached_price(ticker, priority, max_age)
+    if price is None:
+        price = refresh_quote(ticker, priority)
+        if snapshot is not None:
+            snapshot.fetches += 1
+    if snapshot is not None:
+        snapshot.prices[ticker] = price
     return price
 
 
+def get_market_prices(tickers, concurrency: Optional[int] = None, priority: int = PRIORITY_DASHBOARD,
+                      max_age: Optional[float] = None) -> Dict[str, float]:
+    snapshot = active_snapshot()
+    prices: Dict[str, float] = {}
+    missing: List[str] = []
+    for ticker in dict.fromkeys(t.upper() for t in tickers):
+        if snapshot is not None and ticker in snapshot.prices:
+            metrics.count('quote_cache', 'snapshot')
+            prices[ticker] = snapshot.prices[ticker]
+            continue
+        price = cached_price(ticker, priority, max_age)
+        if price is None:
+            missing.append(ticker)
+        else:
+            prices[ticker] = price
+    if len(missing) == 1:
+        prices[missing[0]] = refresh_quote(missing[0], priority)
+    elif missing:
+        from concurrent.futures import ThreadPoolExecutor
+        workers = max(1, min(concurrency or QUOTE_CONCURRENCY, len(missing)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for ticker, price in zip(missing, pool.map(lambda t: refresh_quote(t, priority), missing)):
+                prices[ticker] = price
+    if snapshot is not None:
+        snapshot.fetches += len(missing)
+        snapshot.prices.update(prices)
+    return prices
+
+
 def place_real_order(order_type: str, ticker: str, qty: int, price: float):
     print(f"Placed real {order_type} order: {qty} shares of {ticker} at ${price}/share.")
 
 
-def show_chart(ticker: str, interval: str = '5min'):
+# name -> (function, interval param, payload key, label, seconds per bar)
+CHART_INTERVALS = {
+    'day': ("TIME_SERIES_DAILY", None, "Time Series (Daily)", 'Daily', 86400),
+    '60min': ("TIME_SERIES_INTRADAY", "60min", "Time Series (60min)", 'Hourly', 3600),
+    '240min': ("TIME_SERIES_INTRADAY", "240min", "Time Series (240min)", '4 Hour', 14400),
+    '1min': ("TIME_SERIES_INTRADAY", "1min", "Time Series (1min)", '1 Minute', 60),
+    '5min': ("TIME_SERIES_INTRADAY", "5min", "Time Series (5min)", '5min', 300),
+}
+
+
+def chart_interval(raw: str) -> str:
+    raw = raw.lower()
+    if raw in ['d', '1d', 'day', 'daily']:
+        return 'day'
+    if raw in ['1h', 'hour', '60min']:
+        return '60min'
+    if raw in ['4h', '4hour', '240min']:
+        return '240min'
+    if raw in ['1min', 'minute']:
+        return '1min'
+    return '5min'
+
+
+class BarStore:
+    def __init__(self, path: str = BARS_DB):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        if self._conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS bars (symbol TEXT, interval TEXT, ts INTEGER, open REAL, high REAL,"
+                         " low REAL, close REAL, volume REAL, PRIMARY KEY (symbol, interval, ts)) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS syncs (symbol TEXT, interval TEXT, synced_at REAL,"
+                         " PRIMARY KEY (symbol, interval)) WITHOUT ROWID")
+            self._conn = conn
+        return self._conn
+
+    def latest_ts(self, symbol: str, interval: str) -> Optional[int]:
+        with self._lock:
+            row = self._db().execute("SELECT MAX(ts) FROM bars WHERE symbol = ? AND interval = ?", (symbol, interval)).fetchone()
+        return row[0] if row else None
+
+    def last_sync(self, symbol: str, interval: str) -> Optional[float]:
+        with self._lock:
+            row = self._db().execute("SELECT synced_at FROM syncs WHERE symbol = ? AND interval = ?", (symbol, interval)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, symbol: str, interval: str, bars: List[Tuple], synced: bool = True):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               [(symbol, interval) + tuple(bar) for bar in bars])
+                if synced:
+                    db.execute("INSERT OR REPLACE INTO syncs VALUES (?, ?, ?)", (symbol, interval, time.time()))
+
+    def iter_all(self, chunk: int = 4096):
+        with self._lock:
+            cursor = self._db().execute("SELECT * FROM bars ORDER BY symbol, interval, ts")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(chunk)
+            if not rows:
+                return
+            yield from rows
+
+    def load(self, symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+             limit: Optional[int] = None) -> List[Tuple]:
+        query = "SELECT ts, open, high, low, close, volume FROM bars WHERE symbol = ? AND interval = ?"
+        params: List = [symbol, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(start)
+        if end is not None:
+            query += " AND ts <= ?"
+            params.append(end)
+        query += " ORDER BY ts DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db().execute(query, params).fetchall()
+        rows.reverse()
+        return rows
+
+
+bar_store = BarStore()
+
+
+def parse_bars(series: Dict[str, Dict[str, str]]) -> List[Tuple]:
+    bars = []
+    for stamp, bar in series.items():
+        fmt = "%Y-%m-%d %H:%M:%S" if ' ' in stamp else "%Y-%m-%d"
+        ts = int(datetime.datetime.strptime(stamp, fmt).replace(tzinfo=datetime.timezone.utc).timestamp())
+        bars.append((ts, float(bar["1. open"]), float(bar["2. high"]), float(bar["3. low"]),
+                     float(bar["4. close"]), float(bar.get("5. volume", 0) or 0)))
+    bars.sort()
+    return bars
+
+
+def sync_bars(ticker: str, interval: str, priority: int = PRIORITY_DASHBOARD) -> int:
+    function, av_interval, time_key, _, seconds = CHART_INTERVALS[interval]
+    latest = bar_store.latest_ts(ticker, interval)
+    synced_at = bar_store.last_sync(ticker, interval)
+    if synced_at is not None and time.time() - synced_at < min(seconds, DAILY_SYNC_INTERVAL):
+        return 0
+    params = {"function": function, "symbol": ticker}
+    if av_interval:
+        params["interval"] = av_interval
+    compact = latest is not None and time.time() - latest < seconds * AV_COMPACT_BARS
+    params["outputsize"] = "compact" if compact else "full"
+    try:
+        data = (alpha_vantage_query(params, priority) or {}).get(time_key, {})
+    except Exception as e:
+        if latest is None:
+            raise
+        print(f"Chart data offline ({type(e).__name__}); showing stored bars.")
+        return 0
+    # The newest stored bar may have been partial, so it is rewritten too.
+    bars = [bar for bar in parse_bars(data) if latest is None or bar[0] >= latest]
+    if bars:
+        bar_store.upsert(ticker, interval, bars)
+    return len(bars)
+
+
+def load_charts():
+    try:
+        import charts
+    except ImportError:
+        return None
+    return charts
+
+
+def terminal_width() -> int:
+    import shutil
+    return shutil.get_terminal_size((80, 24)).columns
+
+
+def print_ascii_chart(title: str, values: List[float], overlays=(), height: int = 10, stamps=None):
+    # Downsampled to the terminal width when numpy is available; otherwise the last 50 values.
+    charts = load_charts()
+    if charts is not None and len(values):
+        sys.stdout.write(charts.render_line(title, values, overlays, terminal_width(), height, stamps))
+        return
+    width = min(50, len(values))
+    values = list(values[-width:])
+    overlays = [(list(series)[-width:], mark) for series, mark in overlays]
+    visible = values + [v for series, _ in overlays for v in series if v == v]
+    min_p = min(visible)
+    max_p = max(visible)
+    scale = (max_p - min_p) / (height - 1) if max_p != min_p else 1
+    chart = [[' ' for _ in range(width)] for _ in range(height)]
+    for series, mark in overlays + [(values, '*')]:
+        for i, p in enumerate(series):
+            if p != p:
+                continue
+            y = int(round((p - min_p) / scale)) if scale else 0
+            y = min(y, height - 1)
+            chart[height - 1 - y][i] = mark
+    print(f"\n{title}:")
+    y_labels = [min_p + scale * (height - 1 - i) for i in range(height)]
+    for i, row in enumerate(chart):
+        label = f"{y_labels[i]:7.2f} | "
+        print(label + ''.join(row))
+    print("        +" + "-" * width)
+    print("         " + ''.join([str((i//10)%10) if i%10==0 else ' ' for i in range(width)]))
+    print(f"Min: {min_p:.2f}  Max: {max_p:.2f}")
+
+
+def show_chart(ticker: str, interval: str = '5min', count: Optional[int] = None):
     ticker = ticker.upper()
-    interval = interval.lower()
-    if interval in ['d', '1d', 'day']:
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_DAILY&symbol={ticker}&apikey={ALPHA_VANTAGE_KEY}"
-        time_key = "Time Series (Daily)"
-        label = 'Daily'
-    elif interval in ['1h', 'hour', '60min']:
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={ticker}&interval=60min&apikey={ALPHA_VANTAGE_KEY}"
-        time_key = "Time Series (60min)"
-        label = 'Hourly'
-    elif interval in ['4h', '4hour', '240min']:
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={ticker}&interval=240min&apikey={ALPHA_VANTAGE_KEY}"
-        time_key = "Time Series (240min)"
-        label = '4 Hour'
-    elif interval in ['1min', 'minute']:
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={ticker}&interval=1min&apikey={ALPHA_VANTAGE_KEY}"
-        time_key = "Time Series (1min)"
-        label = '1 Minute'
-    else:
-        url = f"https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={ticker}&interval=5min&apikey={ALPHA_VANTAGE_KEY}"
-        time_key = "Time Series (5min)"
-        label = '5min'
+    interval = chart_interval(interval)
+    label = CHART_INTERVALS[interval][3]
     try:
-        r = requests.get(url, timeout=10)
-        data = r.json().get(time_key, {})
-        if not data:
+        sync_bars(ticker, interval)
+        bars = bar_store.load(ticker, interval, limit=count)
+        if not bars:
             print(f"No chart data for {ticker}.")
             return
-        times = list(data.keys())[::-1]
-        prices = [float(data[t]["4. close"]) for t in times]
-        min_p = min(prices)
-        max_p = max(prices)
-        width = min(50, len(prices))
-        height = 10
-        scale = (max_p - min_p) / (height - 1) if max_p != min_p else 1
-        chart = [[' ' for _ in range(width)] for _ in range(height)]
-        for i in range(width):
-            idx = -width + i if len(prices) >= width else i
-            p = prices[idx]
-            y = int(round((p - min_p) / scale)) if scale else 0
-            y = min(y, height - 1)
-            chart[height - 1 - y][i] = '*'
-        print(f"\nPrice History for {ticker} ({label} ASCII Chart):")
-        y_labels = [min_p + scale * (height - 1 - i) for i in range(height)]
-        for i, row in enumerate(chart):
-            label = f"{y_labels[i]:7.2f} | "
-            print(label + ''.join(row))
-        print("        +" + "-" * width)
-        print("         " + ''.join([str((i//10)%10) if i%10==0 else ' ' for i in range(width)]))
-        print(f"Min: {min_p:.2f}  Max: {max_p:.2f}")
+        print_ascii_chart(f"Price History for {ticker} ({label} ASCII Chart)", [bar[4] for bar in bars],
+                          stamps=[bar[0] for bar in bars])
     except Exception as e:
         print(f"Chart error: {e}")
 
 
+POPULAR_PAIRS = [
+    "EURUSD", "GBPUSD", "USDJPY", "AUDUSD", "BTCUSD", "ETHUSD", "TSLA", "AAPL", "GOOGL", "MSFT", "NVDA", "META", "AMZN", "NFLX", "BABA", "INTC", "AMD", "UBER", "DIS", "V", "JPM", "BAC", "WMT", "T", "KO", "PEP", "MCD", "PYPL", "SBUX", "SHOP", "SQ"
+]
+
+
 def show_popular_pairs(positions=None):
-    popular_pairs = [
-        "EURUSD", "GBPUSD", "USDJPY", "AUDUSD", "BTCUSD", "ETHUSD", "TSLA", "AAPL", "GOOGL", "MSFT", "NVDA", "META", "AMZN", "NFLX", "BABA", "INTC", "AMD", "UBER", "DIS", "V", "JPM", "BAC", "WMT", "T", "KO", "PEP", "MCD", "PYPL", "SBUX", "SHOP", "SQ"
-    ]
+    popular_pairs = POPULAR_PAIRS
     print(f"Popular Pairs and Tickers:{RESET}")
+    prices = get_market_prices(popular_pairs, priority=PRIORITY_POPULAR)
     for pair in popular_pairs:
-        price = get_market_price(pair)
+        price = prices[pair]
         holding = None
         if positions and pair in positions:
             holding = positions[pair]['qty']
@@ -144,6 +1032,7 @@ def remove_favourite():
     q = input("Enter ticker to remove from favourites: ").strip().upper()
     if q in favourites:
         favourites.remove(q)
+        record_event('favourite', ticker=q, on=False)
         print(f"Removed {q} from favourites.")
     else:
         print(f"{q} is not in favourites.")
@@ -151,28 +1040,23 @@ def remove_favourite():
 
 def show_gainers_losers():
     print("Top Gainers/Losers (session):")
-    changes = []
-    for ticker, data in market_data.items():
-        if isinstance(data, dict) and 'history' in data and isinstance(data['history'], list) and len(data['history']) >= 2:
-            change = data['history'][-1] - data['history'][0]
-            changes.append((change, ticker))
-    if not changes:
+    if not session_analytics:
         print("Not enough data.")
         return
-    changes.sort(reverse=True)
     print("Gainers:")
-    for ch, t in changes[:5]:
+    for ch, t in session_analytics.gainers(5):
         print(f"  {t}: {ch:+.2f}")
     print("Losers:")
-    for ch, t in changes[-5:]:
+    for ch, t in reversed(session_analytics.losers(5)):
         print(f"  {t}: {ch:+.2f}")
 
 
 def show_last_trade_time():
     print("Last trade time for tickers:")
-    for ticker, data in market_data.items():
-        if isinstance(data, dict) and 'history' in data and data['history']:
-            print(f"  {ticker}: {len(data['history'])} updates ago")
+    for ticker, series in list(market_data.items()):
+        if series:
+            when = datetime.datetime.fromtimestamp(series.time_at(-1)).strftime('%H:%M:%S')
+            print(f"  {ticker}: {when} ({series.updates} updates)")
 
 
 def print_banner():
@@ -180,41 +1064,15 @@ def print_banner():
     print(banner)
 
 
-def print_help():
-    print(f"Available Commands:{RESET}")
-    print("  help                   - Show this help message")
-    print("  quote <ticker>         - Get the current market quote for the ticker")
-    print("  buy <ticker> <qty>     - Buy specified number of shares")
-    print("  sell <ticker> <qty>    - Sell specified number of shares")
-    print("  positions              - Show current holdings and profit/loss")
-    print("  chart <ticker> <day|hour|4hour|minute|5min> - Display price history chart (ASCII)")
-    print("  dashboard              - Show customizable dashboard summary")
-    print("  analytics              - Show advanced analytics")
-    print("  alert                  - Set price/volume alerts")
-    print("  integrations           - Integrations menu")
-    print("  exportcsv              - Export portfolio to CSV")
-    print("  customize              - Customize dashboard")
-    print("  popular                - Show popular trading pairs/tickers with price and holding")
-    print("  gainers                - Show top gainers and losers")
-    print("  lasttrade              - Show last trade time for tickers")
-    print("  favourite <ticker>     - Add a ticker to favourites")
-    print("  removefav              - Remove a ticker from favourites")
-    print("  favourites             - List favourite tickers")
-    print("  screener               - Run the price screener")
-    print("  setmode <dummy|real>   - Set trading mode")
-    print("  config                 - Configure credentials for real trading mode")
-    print("  ai <prompt>              - Ask Hack Club AI any question")
-    print("  clear / cls            - Clear the terminal screen")
-    print("  exit                   - Exit the terminal")
-
-
 def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
+    sys.stdout.write("\033[H\033[2J\033[3J")
+    sys.stdout.flush()
 
 
 def add_favourite(ticker: str):
     ticker = ticker.upper()
     favourites.add(ticker)
+    record_event('favourite', ticker=ticker, on=True)
     print(f"Added {ticker} to favourites.")
 
 def show_favourites():
@@ -229,10 +1087,9 @@ def show_favourites():
 def show_screener():
     print(f"Screener Results:{RESET}")
     detected = False
-    for ticker, data in market_data.items():
-        if isinstance(data, dict) and 'history' in data and isinstance(data['history'], list) and len(data['history']) >= 2 and data['history'][-1] > data['history'][-2]:
-            print(f"  {ticker} is trending up. Current price: ${data['price']}")
-            detected = True
+    for ticker, price in session_analytics.trending_up():
+        print(f"  {ticker} is trending up. Current price: ${price}")
+        detected = True
     if not detected:
         print("  No trending tickers detected.")
     print()
@@ -242,96 +1099,447 @@ def show_analytics():
     if not market_data:
         print("No analytics available yet.")
         return
-    changes = []
-    for ticker, data in market_data.items():
-        if isinstance(data, dict) and 'history' in data and isinstance(data['history'], list) and len(data['history']) >= 2:
-            change = data['history'][-1] - data['history'][0]
-            changes.append((change, ticker))
-    if not changes:
+    count = len(session_analytics)
+    if not count:
         print("Not enough data for analytics.")
         return
-    changes.sort(reverse=True)
-    best = changes[0]
-    worst = changes[-1]
-    avg_return = sum([c[0] for c in changes]) / len(changes)
-    win_count = sum(1 for c in changes if c[0] > 0)
+    best = session_analytics.gainers(1)[0]
+    worst = session_analytics.losers(1)[0]
+    avg_return = session_analytics.total_change / count
+    win_count = session_analytics.wins
     print(f"Best performer: {best[1]} ({best[0]:+.2f})")
     print(f"Worst performer: {worst[1]} ({worst[0]:+.2f})")
     print(f"Average return: {avg_return:+.2f}")
-    print(f"Win rate: {win_count}/{len(changes)} ({win_count/len(changes)*100:.1f}%)")
+    print(f"Win rate: {win_count}/{count} ({win_count/count*100:.1f}%)")
+
+class Alert:
+    __slots__ = ('id', 'ticker', 'kind', 'target', 'base', 'percent', 'peak', 'interval')
+
+    def __init__(self, alert_id: int, ticker: str, kind: str, target: float = 0.0, base: float = 0.0,
+                 percent: float = 0.0, interval: float = ALERT_POLL_INTERVAL):
+        self.id = alert_id
+        self.ticker = ticker
+        self.kind = kind
+        self.target = target
+        self.base = base
+        self.percent = percent
+        self.peak = base
+        self.interval = interval
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def describe(self) -> str:
+        if self.kind == 'percent':
+            return f"{self.ticker} moves ±{self.percent}% from ${self.base} every {self.interval:g}s"
+        if self.kind == 'trailing':
+            return f"{self.ticker} falls {self.percent}% from its peak (now ${self.peak}) every {self.interval:g}s"
+        return f"{self.ticker} {self.kind} ${self.target} every {self.interval:g}s"
+
+    def message(self, price: float) -> str:
+        if self.kind == 'above':
+            return f"ALERT: {self.ticker} has reached ${price} (target: ${self.target})!"
+        if self.kind == 'below':
+            return f"ALERT: {self.ticker} has dropped to ${price} (target: ${self.target})!"
+        if self.kind == 'percent':
+            change = ((price - self.base) / self.base) * 100
+            return f"ALERT: {self.ticker} has moved {change:+.2f}% (target: ±{self.percent}%) from ${self.base} to ${price}!"
+        drop = ((self.peak - price) / self.peak) * 100
+        return f"ALERT: {self.ticker} has fallen {drop:.2f}% from its peak ${self.peak} to ${price} (trailing: {self.percent}%)!"
+
+
+class AlertEngine:
+    def __init__(self):
+        self.alerts: Dict[int, Alert] = {}
+        self._above: Dict[str, List[Tuple[float, int]]] = {}
+        self._below: Dict[str, List[Tuple[float, int]]] = {}
+        self._trailing: Dict[str, Dict[int, Alert]] = {}
+        self._counts: Dict[str, int] = {}
+        self._intervals: Dict[float, Dict[str, int]] = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    def _add(self, alert: Alert) -> Alert:
+        with self._lock:
+            self.alerts[alert.id] = alert
+            self._counts[alert.ticker] = self._counts.get(alert.ticker, 0) + 1
+            group = self._intervals.setdefault(alert.interval, {})
+            group[alert.ticker] = group.get(alert.ticker, 0) + 1
+            for side, level in self._levels(alert):
+                bisect.insort(side.setdefault(alert.ticker, []), (level, alert.id))
+            if alert.kind == 'trailing':
+                self._trailing.setdefault(alert.ticker, {})[alert.id] = alert
+        return alert
+
+    def _levels(self, alert: Alert):
+        if alert.kind == 'above':
+            return [(self._above, alert.target)]
+        if alert.kind == 'below':
+            return [(self._below, alert.target)]
+        if alert.kind == 'percent':
+            return [(self._above, alert.base * (1 + alert.percent / 100)),
+                    (self._below, alert.base * (1 - alert.percent / 100))]
+        return []
+
+    def _new_id(self) -> int:
+        with self._lock:
+            alert_id = self._next_id
+            self._next_id += 1
+            return alert_id
+
+    def restore(self, data: Dict) -> Alert:
+        with self._lock:
+            alert = Alert(data['id'], data['ticker'], data['kind'], data.get('target', 0.0), data.get('base', 0.0),
+                          data.get('percent', 0.0), data.get('interval', ALERT_POLL_INTERVAL))
+            alert.peak = data.get('peak', alert.base)
+            self._next_id = max(self._next_id, alert.id + 1)
+            return self._add(alert)
+
+    def add_above(self, ticker: str, target: float, interval: float = ALERT_POLL_INTERVAL) -> Alert:
+        return self._add(Alert(self._new_id(), ticker, 'above', target=target, interval=interval))
+
+    def add_below(self, ticker: str, target: float, interval: float = ALERT_POLL_INTERVAL) -> Alert:
+        return self._add(Alert(self._new_id(), ticker, 'below', target=target, interval=interval))
+
+    def add_percent(self, ticker: str, base: float, percent: float, interval: float = ALERT_POLL_INTERVAL) -> Alert:
+        return self._add(Alert(self._new_id(), ticker, 'percent', base=base, percent=percent, interval=interval))
+
+    def add_trailing(self, ticker: str, base: float, percent: float, interval: float = ALERT_POLL_INTERVAL) -> Alert:
+        return self._add(Alert(self._new_id(), ticker, 'trailing', base=base, percent=percent, interval=interval))
+
+    def _discard(self, alert: Alert):
+        self.alerts.pop(alert.id, None)
+        remaining = self._counts.get(alert.ticker, 1) - 1
+        if remaining:
+            self._counts[alert.ticker] = remaining
+        else:
+            self._counts.pop(alert.ticker, None)
+        group = self._intervals.get(alert.interval, {})
+        remaining = group.get(alert.ticker, 1) - 1
+        if remaining:
+            group[alert.ticker] = remaining
+        else:
+            group.pop(alert.ticker, None)
+            if not group:
+                self._intervals.pop(alert.interval, None)
+        for side, level in self._levels(alert):
+            entries = side.get(alert.ticker)
+            if not entries:
+                continue
+            i = bisect.bisect_left(entries, (level, alert.id))
+            if i < len(entries) and entries[i] == (level, alert.id):
+                del entries[i]
+            if not entries:
+                del side[alert.ticker]
+        trailing = self._trailing.get(alert.ticker)
+        if trailing is not None:
+            trailing.pop(alert.id, None)
+            if not trailing:
+                del self._trailing[alert.ticker]
+
+    def remove(self, alert_id: int) -> bool:
+        with self._lock:
+            alert = self.alerts.get(alert_id)
+            if alert is None:
+                return False
+            self._discard(alert)
+            return True
+
+    def evaluate(self, ticker: str, price: float) -> List[Alert]:
+        with self._lock:
+            return self._evaluate(ticker, price)
+
+    def _evaluate(self, ticker: str, price: float) -> List[Alert]:
+        hits: List[int] = []
+        above = self._above.get(ticker)
+        if above and above[0][0] <= price:
+            hits.extend(i for _, i in above[:bisect.bisect_right(above, (price, math.inf))])
+        below = self._below.get(ticker)
+        if below and below[-1][0] >= price:
+            hits.extend(i for _, i in below[bisect.bisect_left(below, (price, 0)):])
+        for alert in self._trailing.get(ticker, {}).values():
+            if price > alert.peak:
+                alert.peak = price
+            elif price <= alert.peak * (1 - alert.percent / 100):
+                hits.append(alert.id)
+        fired = [self.alerts[i] for i in dict.fromkeys(hits)]
+        for alert in fired:
+            self._discard(alert)
+        return fired
+
+    def tickers(self) -> List[str]:
+        with self._lock:
+            return list(self._counts)
+
+    def interval_groups(self) -> Dict[float, List[str]]:
+        with self._lock:
+            return {interval: list(group) for interval, group in self._intervals.items()}
+
+    def snapshot(self) -> List[Alert]:
+        with self._lock:
+            return list(self.alerts.values())
+
+    def clear(self):
+        with self._lock:
+            self.alerts.clear()
+            self._above.clear()
+            self._below.clear()
+            self._trailing.clear()
+            self._counts.clear()
+            self._intervals.clear()
+
+    def __len__(self) -> int:
+        return len(self.alerts)
+
+
+alert_engine = AlertEngine()
+
+_output_lock = threading.Lock()
+prompt_active = False
+# Set by the daemon so alert notices go to the clients on the notice's profile instead of its own stdout.
+notice_sink: Optional[Callable[[str, str], None]] = None
+# True while the daemon runs a client's request.
+remote_caller = False
+# Only a daemon started with --mode real --allow-remote-real lets its clients trade for real.
+remote_real = False
+
+
+def read_command() -> str:
+    global prompt_active
+    prompt_active = True
+    try:
+        return input(PROMPT).strip()
+    finally:
+        prompt_active = False
 
-def set_alert():
-    ticker = input("Set alert for ticker: ").strip().upper()
+
+def notify(message: str, profile: Optional[str] = None):
+    if notice_sink is not None:
+        notice_sink(message, profile or current_profile)
+        return
+    with _output_lock:
+        if not prompt_active:
+            print(message)
+            return
+        try:
+            import readline
+            pending = readline.get_line_buffer()
+        except ImportError:
+            pending = ''
+        sys.stdout.write(f"\r\033[K{message}\n{PROMPT}{pending}")
+        sys.stdout.flush()
+
+
+class AlertMonitor:
+    def __init__(self, engine: AlertEngine):
+        self.engine = engine
+        self._due: Dict[float, float] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="alert-monitor", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                delay = self.poll()
+            except Exception as e:
+                notify(f"Alert monitor error: {e}")
+                delay = ALERT_MIN_INTERVAL
+            self._wake.wait(delay)
+
+    def engines(self) -> List[Tuple[str, AlertEngine, Optional['Journal']]]:
+        # The active profile's alerts, plus any parked for other profiles that daemon clients are on.
+        return [(current_profile, self.engine, None)] + [(name, engine, files)
+                                                         for name, (engine, files) in list(parked_alerts.items())]
+
+    def poll(self) -> float:
+        engines = self.engines()
+        groups: Dict[float, Set[str]] = {}
+        for _, engine, _ in engines:
+            for interval, tickers in engine.interval_groups().items():
+                groups.setdefault(interval, set()).update(tickers)
+        now = time.monotonic()
+        for interval in list(self._due):
+            if interval not in groups:
+                del self._due[interval]
+        due_tickers: List[str] = []
+        max_age = None
+        for interval, tickers in groups.items():
+            if self._due.setdefault(interval, now + interval) <= now:
+                due_tickers.extend(tickers)
+                max_age = interval if max_age is None else min(max_age, interval)
+                self._due[interval] = now + interval
+        if due_tickers:
+            prices = get_market_prices(due_tickers, priority=PRIORITY_ALERT, max_age=max_age)
+            for name, engine, files in engines:
+                for message in evaluate_alerts(prices, engine, files):
+                    notify(message, name)
+        if not self._due:
+            return ALERT_POLL_INTERVAL
+        return max(0.0, min(self._due.values()) - time.monotonic())
+
+
+alert_monitor = AlertMonitor(alert_engine)
+# Alerts of profiles in use by daemon clients while another profile is active, each with its
+# profile's journal for recording firings: profile -> (engine, journal).
+parked_alerts: Dict[str, Tuple[AlertEngine, 'Journal']] = {}
+
+
+def parse_interval(raw: str) -> float:
+    raw = raw.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if raw and raw[-1] in units:
+        return float(raw[:-1]) * units[raw[-1]]
+    return float(raw)
+
+
+def watch_alert(alert: Alert):
+    record_event('alert_add', alert=alert.to_dict())
+    alert_monitor.start()
+
+
+def set_alert(args: List[str]):
+    if args:
+        ticker = args[0].upper()
+        direction = args[1].lower() if len(args) == 3 else None
+        raw_target = args[-1] if len(args) > 1 else ''
+    else:
+        ticker = input("Set alert for ticker: ").strip().upper()
+        direction = None
+        raw_target = input("Alert when price crosses: ").strip()
+    if direction not in (None, 'above', 'below'):
+        print("Usage: alert <ticker> [above|below] <price>")
+        return
     try:
-        target = float(input("Alert when price crosses: ").strip())
+        target = float(raw_target)
     except ValueError:
         print("Invalid price.")
         return
-    print(f"Alert set for {ticker} at ${target} (session only)")
-    if 'alerts' not in market_data:
-        market_data['alerts'] = []
-    market_data['alerts'].append((ticker, target))
+    if direction is None:
+        price = get_market_price(ticker, PRIORITY_ALERT)
+        if price == 0.0:
+            print("Failed to fetch a valid market price. Please try again later.")
+            return
+        direction = 'above' if target >= price else 'below'
+    if direction == 'above':
+        alert = alert_engine.add_above(ticker, target)
+    else:
+        alert = alert_engine.add_below(ticker, target)
+    watch_alert(alert)
+    print(f"Alert #{alert.id} set for {ticker} {direction} ${target}")
 
-def set_percentage_alert():
-    ticker = input("Set percentage alert for ticker: ").strip().upper()
+def _set_relative_alert(args: List[str], kind: str):
+    if args:
+        if len(args) != 2:
+            print(f"Usage: {'alertpct' if kind == 'percent' else 'alerttrail'} <ticker> <percent>")
+            return
+        ticker, raw_percent = args[0].upper(), args[1]
+    elif kind == 'percent':
+        ticker = input("Set percentage alert for ticker: ").strip().upper()
+        raw_percent = input("Alert when price moves by percent (e.g. 5 for ±5%): ").strip()
+    else:
+        ticker = input("Set trailing alert for ticker: ").strip().upper()
+        raw_percent = input("Alert when price falls from its peak by percent: ").strip()
     try:
-        percent = float(input("Alert when price moves by percent (e.g. 5 for ±5%): ").strip())
+        percent = float(raw_percent)
+        if percent <= 0:
+            raise ValueError
     except ValueError:
         print("Invalid percent.")
         return
-    price = get_market_price(ticker)
+    price = get_market_price(ticker, PRIORITY_ALERT)
     if price == 0.0:
         print("Failed to fetch a valid market price. Please try again later.")
         return
-    if 'alerts_pct' not in market_data:
-        market_data['alerts_pct'] = []
-    market_data['alerts_pct'].append((ticker, price, percent))
-    print(f"Percentage alert set for {ticker}: ±{percent}% from ${price}")
+    if kind == 'percent':
+        alert = alert_engine.add_percent(ticker, price, percent)
+        print(f"Percentage alert #{alert.id} set for {ticker}: ±{percent}% from ${price}")
+    else:
+        alert = alert_engine.add_trailing(ticker, price, percent)
+        print(f"Trailing alert #{alert.id} set for {ticker}: {percent}% below its peak (now ${price})")
+    watch_alert(alert)
 
+def set_percentage_alert(args: List[str]):
+    _set_relative_alert(args, 'percent')
 
-def check_alerts():
-    if 'alerts' not in market_data:
-        return
-    fired = []
-    for (ticker, target) in market_data['alerts']:
-        price = get_market_price(ticker)
-        if price >= target:
-            print(f"ALERT: {ticker} has reached ${price} (target: ${target})!")
-            fired.append((ticker, target))
-    for alert in fired:
-        market_data['alerts'].remove(alert)
-
-def check_percentage_alerts():
-    if 'alerts_pct' not in market_data:
-        return
-    fired = []
-    for (ticker, base_price, percent) in market_data['alerts_pct']:
-        price = get_market_price(ticker)
+def set_trailing_alert(args: List[str]):
+    _set_relative_alert(args, 'trailing')
+
+def show_alerts():
+    if not alert_engine:
+        print("No alerts set.")
+        return
+    print("Active Alerts:")
+    for alert in alert_engine.snapshot():
+        print(f"  #{alert.id}: {alert.describe()}")
+
+def remove_alert(raw_id: str):
+    try:
+        alert_id = int(raw_id.lstrip('#'))
+    except ValueError:
+        print("Alert id must be a number.")
+        return
+    if alert_engine.remove(alert_id):
+        record_event('alert_remove', id=alert_id)
+        print(f"Alert #{alert_id} removed.")
+    else:
+        print(f"No alert #{alert_id}.")
+
+
+def evaluate_alerts(prices: Dict[str, float], engine: Optional[AlertEngine] = None,
+                    files: Optional['Journal'] = None) -> List[str]:
+    # A parked profile's firings go to its own journal rather than the active one.
+    if engine is None:
+        engine = alert_engine
+    messages = []
+    for ticker, price in prices.items():
         if price == 0.0:
             continue
-        change = ((price - base_price) / base_price) * 100
-        if abs(change) >= percent:
-            print(f"ALERT: {ticker} has moved {change:+.2f}% (target: ±{percent}%) from ${base_price} to ${price}!")
-            fired.append((ticker, base_price, percent))
-    for alert in fired:
-        market_data['alerts_pct'].remove(alert)
+        for alert in engine.evaluate(ticker, price):
+            if files is None:
+                record_event('alert_remove', id=alert.id)
+            elif files.is_open():
+                files.append({'type': 'alert_remove', 'id': alert.id})
+            messages.append(alert.message(price))
+    return messages
+
+
+def check_alerts():
+    # Prices fetched by the command are checked for free; polling is left to alert_monitor.
+    snapshot = active_snapshot()
+    if not alert_engine or snapshot is None:
+        return
+    for message in evaluate_alerts(snapshot.prices):
+        print(message)
 
 def integrations_menu():
     print("Integrations:")
     print("  - Export portfolio to CSV (type 'exportcsv')")
     print("  - [Future] Discord, Telegram, broker APIs")
 
-def export_portfolio_csv(positions):
-    import csv
-    fname = "portfolio_export.csv"
-    with open(fname, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["Ticker", "Shares", "Avg Cost", "Current Price", "Market Value"])
-        for ticker, pos in positions.items():
-            current_price = get_market_price(ticker)
-            avg_cost = pos['cost'] / pos['qty']
-            value = round(current_price * pos['qty'], 2)
-            writer.writerow([ticker, pos['qty'], f"{avg_cost:.2f}", f"{current_price:.2f}", f"{value:.2f}"])
+def export_portfolio_csv(positions, fname: str = "portfolio_export.csv"):
+    # The original report layout, with cost per share; 'export positions' is the round-trip schema.
+    import dataio
+    prices = get_market_prices(positions)
+    rows = ((ticker, pos['qty'], f"{pos['cost'] / pos['qty']:.2f}", f"{prices.get(ticker, 0.0):.2f}",
+             f"{prices.get(ticker, 0.0) * pos['qty']:.2f}") for ticker, pos in list(positions.items()))
+    try:
+        dataio.write_rows(fname, PORTFOLIO_CSV_COLUMNS, 'sisss', rows, 'csv')
+    except OSError as e:
+        print(f"Export failed: {e}")
+        return False
     print(f"Portfolio exported to {fname}")
 
 def customize_dashboard():
@@ -340,39 +1548,54 @@ def customize_dashboard():
     print("Type a comma-separated list of tickers (e.g. TSLA,AAPL,GOOGL) or 'all' for all holdings.")
     tickers = input("Tickers for dashboard: ")
 
+    global dashboard_custom
     if tickers.strip().upper() == 'ALL':
-        market_data['dashboard_custom'] = None
+        dashboard_custom = None
         print("Dashboard will show all holdings.")
     else:
         selected = [t.strip().upper() for t in tickers.split(',') if t.strip()]
-        market_data['dashboard_custom'] = selected
+        dashboard_custom = selected
         print(f"Dashboard will show: {', '.join(selected)}")
+    record_event('dashboard', tickers=dashboard_custom)
 
 def dashboard_summary(positions, filter_type=None):
     print("Customizable Dashboard (basic summary):")
     total_invested = 0.0
     total_value = 0.0
     filtered = positions.items()
-    custom = market_data.get('dashboard_custom', None)
+    custom = dashboard_custom
+    if filter_type == 'all':
+        filter_type = None
     if custom is not None:
         filtered = [(t, p) for t, p in positions.items() if t in custom]
+    prices = get_market_prices([t for t, _ in filtered])
+    # A failed fetch leaves the old mark (or the average cost) in place, which must not pass for current.
+    unquoted = [t for t, _ in filtered if not prices.get(t)]
     if filter_type == 'gainers':
-        filtered = [(t, p) for t, p in filtered if get_market_price(t) > (p['cost']/p['qty'])]
+        filtered = [(t, p) for t, p in filtered if prices.get(t) and prices[t] > (p['cost']/p['qty'])]
     elif filter_type == 'losers':
-        filtered = [(t, p) for t, p in filtered if get_market_price(t) < (p['cost']/p['qty'])]
+        filtered = [(t, p) for t, p in filtered if prices.get(t) and prices[t] < (p['cost']/p['qty'])]
     if not filtered:
         print("No positions to display in dashboard.")
         return
     for ticker, pos in filtered:
-        current_price = get_market_price(ticker)
-        value = round(current_price * pos['qty'], 2)
+        if ticker in unquoted:
+            print(f"  {ticker}: {pos['qty']} shares | Value: n/a | Current: no quote")
+            continue
+        current_price = portfolio_valuation.price(ticker)
+        value = round(portfolio_valuation.value(ticker), 2)
         total_invested += pos['cost']
         total_value += value
         print(f"  {ticker}: {pos['qty']} shares | Value: ${value} | Current: ${current_price}")
-    print(f"Total Invested: ${total_invested}")
-    print(f"Portfolio Value: ${total_value}")
+    if custom is None and filter_type is None:
+        total_invested = portfolio_valuation.cost_basis - sum(positions[t]['cost'] for t in unquoted)
+        total_value = portfolio_valuation.market_value - sum(portfolio_valuation.value(t) for t in unquoted)
+    print(f"Total Invested: ${round(total_invested, 2)}")
+    print(f"Portfolio Value: ${round(total_value, 2)}")
     if filter_type:
         print(f"(Filtered: {filter_type})")
+    if unquoted:
+        print(f"(No quote for {', '.join(unquoted)}; left out of the totals)")
     if custom is not None:
         print(f"(Custom dashboard: {', '.join(custom)})")
 
@@ -385,7 +1608,7 @@ def ask_hackclub_ai(prompt: str):
         ]
     }
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=20)
+        resp = http_post(url, headers=headers, data=json.dumps(data), timeout=(HTTP_CONNECT_TIMEOUT, 20))
         if resp.status_code == 200:
             result = resp.json()
             if "choices" in result and result["choices"]:
@@ -397,60 +1620,573 @@ def ask_hackclub_ai(prompt: str):
     except Exception as e:
         print(f"AI request failed: {e}")
 
-def update_portfolio_history(positions: Dict[str, Dict]):
-    total_value = 0.0
-    for ticker, pos in positions.items():
-        current_price = get_market_price(ticker)
-        total_value += current_price * pos['qty']
-    portfolio_history.append(round(total_value, 2))
+def update_portfolio_history():
+    value = round(portfolio_valuation.market_value, 2)
+    portfolio_history.append(value)
+    record_event('history', value=value)
 
 
 def show_portfolio_history():
+    if not portfolio_history and portfolio_valuation.holdings:
+        update_portfolio_history()
     if not portfolio_history:
         print("No portfolio history yet.")
         return
-    width = min(50, len(portfolio_history))
-    height = 10
-    values = portfolio_history[-width:]
-    min_v = min(values)
-    max_v = max(values)
-    scale = (max_v - min_v) / (height - 1) if max_v != min_v else 1
-    chart = [[' ' for _ in range(width)] for _ in range(height)]
-    for i in range(width):
-        v = values[i]
-        y = int(round((v - min_v) / scale)) if scale else 0
-        y = min(y, height - 1)
-        chart[height - 1 - y][i] = '*'
-    print("\nPortfolio Value History (ASCII Chart):")
-    y_labels = [min_v + scale * (height - 1 - i) for i in range(height)]
-    for i, row in enumerate(chart):
-        label = f"{y_labels[i]:7.2f} | "
-        print(label + ''.join(row))
-    print("        +" + "-" * width)
-    print("         " + ''.join([str((i//10)%10) if i%10==0 else ' ' for i in range(width)]))
-    print(f"Min: {min_v:.2f}  Max: {max_v:.2f}")
+    print_ascii_chart("Portfolio Value History (ASCII Chart)", portfolio_history)
+
+
+class Journal:
+    def __init__(self, path: str = JOURNAL_FILE, snapshot_path: str = SNAPSHOT_FILE):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.seq = 0
+        self.snapshot_seq = 0
+        self._valid_bytes: Optional[int] = None
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def load(self) -> Tuple[Optional[Dict], List[Dict]]:
+        snapshot = None
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.seq = self.snapshot_seq = snapshot.get('seq', 0)
+        except FileNotFoundError:
+            pass
+        events = []
+        try:
+            with open(self.path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A torn final write; everything after the last complete line is dropped.
+                        break
+                    offset += len(line)
+                    if event.get('seq', 0) > self.snapshot_seq:
+                        events.append(event)
+                        self.seq = max(self.seq, event['seq'])
+            self._valid_bytes = offset
+        except FileNotFoundError:
+            self._valid_bytes = None
+        return snapshot, events
+
+    def open(self):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if self._valid_bytes is not None and self._file.tell() > self._valid_bytes:
+                    self._file.truncate(self._valid_bytes)
+
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def append(self, event: Dict):
+        with self._lock:
+            if self._file is None:
+                return
+            self.seq += 1
+            event['seq'] = self.seq
+            self._file.write(json.dumps(event, separators=(',', ':')) + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= JOURNAL_FSYNC_EVERY or time.monotonic() - self._last_sync >= JOURNAL_FSYNC_INTERVAL:
+                self._sync()
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def needs_compaction(self) -> bool:
+        return self.seq - self.snapshot_seq >= SNAPSHOT_EVERY
+
+    def compact(self, state: Dict):
+        with self._lock:
+            state = dict(state, seq=self.seq)
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_path)
+            self.snapshot_seq = self.seq
+            # Events up to snapshot_seq are skipped on replay, so a crash before this truncate is harmless.
+            if self._file is not None:
+                self._file.close()
+                self._file = open(self.path, 'w', encoding='utf-8')
+                self._unsynced = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+journal = Journal()
+
+
+def record_event(kind: str, **data):
+    if journal.is_open():
+        data['type'] = kind
+        journal.append(data)
+
+
+def record_trade(positions: Dict[str, Dict], side: str, ticker: str, qty: int, price: float):
+    trade = {'time': time.time(), 'side': side, 'ticker': ticker, 'qty': qty, 'price': price}
+    trade_history.append(trade)
+    sync_position(positions, ticker)
+    record_event('trade', trade=trade, position=positions.get(ticker))
+
+
+def session_state(positions: Dict[str, Dict]) -> Dict:
+    return {
+        'positions': positions,
+        'favourites': sorted(favourites),
+        'watchlist': sorted(watchlist),
+        'notes': ticker_notes,
+        'alerts': [alert.to_dict() for alert in alert_engine.snapshot()],
+        'macros': macros,
+        'portfolio_history': portfolio_history,
+        'trade_history': trade_history,
+        'dashboard_custom': dashboard_custom,
+    }
+
 
+def reset_session(positions: Dict[str, Dict]):
+    global dashboard_custom
+    positions.clear()
+    favourites.clear()
+    watchlist.clear()
+    ticker_notes.clear()
+    alert_engine.clear()
+    macros.clear()
+    portfolio_history.clear()
+    trade_history.clear()
+    last_action.clear()
+    dashboard_custom = None
+
+
+def restore_session(state: Dict, positions: Dict[str, Dict]):
+    global dashboard_custom
+    positions.update(state.get('positions', {}))
+    favourites.update(state.get('favourites', []))
+    watchlist.update(state.get('watchlist', []))
+    ticker_notes.update(state.get('notes', {}))
+    for alert in state.get('alerts', []):
+        alert_engine.restore(alert)
+    macros.update(state.get('macros', {}))
+    portfolio_history.extend(state.get('portfolio_history', []))
+    trade_history.extend(state.get('trade_history', []))
+    dashboard_custom = state.get('dashboard_custom')
+
+
+def apply_event(event: Dict, positions: Dict[str, Dict]):
+    global dashboard_custom
+    kind = event.get('type')
+    if kind == 'trade':
+        trade_history.append(event['trade'])
+        ticker = event['trade']['ticker']
+        if event.get('position'):
+            positions[ticker] = event['position']
+        else:
+            positions.pop(ticker, None)
+    elif kind == 'favourite':
+        (favourites.add if event['on'] else favourites.discard)(event['ticker'])
+    elif kind == 'watch':
+        (watchlist.add if event['on'] else watchlist.discard)(event['ticker'])
+    elif kind == 'note':
+        ticker_notes.setdefault(event['ticker'], []).append(event['note'])
+    elif kind == 'notes':
+        ticker_notes[event['ticker']] = event['notes']
+    elif kind == 'alert_add':
+        alert_engine.restore(event['alert'])
+    elif kind == 'alert_remove':
+        alert_engine.remove(event['id'])
+    elif kind == 'alert_clear':
+        alert_engine.clear()
+    elif kind == 'macro':
+        macros[event['name']] = event['commands']
+    elif kind == 'history':
+        portfolio_history.append(event['value'])
+    elif kind == 'dashboard':
+        dashboard_custom = event['tickers']
+
+
+def profile_journal(name: str) -> Journal:
+    if name == DEFAULT_PROFILE:
+        return Journal()
+    directory = os.path.join(PROFILE_DIR, name)
+    return Journal(os.path.join(directory, JOURNAL_FILE), os.path.join(directory, SNAPSHOT_FILE))
+
+
+def valid_profile_name(name: str) -> bool:
+    return bool(name) and len(name) <= 64 and all(c.isalnum() or c in '-_' for c in name)
+
+
+def saved_profiles() -> List[str]:
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if os.path.isdir(os.path.join(PROFILE_DIR, n))]
+    except FileNotFoundError:
+        names = []
+    return sorted(set(names) | {DEFAULT_PROFILE, current_profile})
 
-def save_data(positions, favourites):
-    with open('portfolio_save.json', 'w') as f:
-        json.dump({'positions': positions, 'favourites': list(favourites)}, f)
-    print("Portfolio and favourites saved.")
 
-def load_data():
+def read_active_profile() -> str:
+    try:
+        with open(ACTIVE_PROFILE_FILE, 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return DEFAULT_PROFILE
+    return name if valid_profile_name(name) else DEFAULT_PROFILE
+
+
+def write_active_profile(name: str):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tmp = ACTIVE_PROFILE_FILE + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(tmp, ACTIVE_PROFILE_FILE)
+
+
+def load_session(positions: Dict[str, Dict]) -> int:
+    reset_session(positions)
+    snapshot, events = journal.load()
+    if snapshot is None and not events and current_profile == DEFAULT_PROFILE and os.path.exists(LEGACY_SAVE_FILE):
+        with open(LEGACY_SAVE_FILE, 'r') as f:
+            snapshot = json.load(f)
+    if snapshot is not None:
+        restore_session(snapshot, positions)
+    for event in events:
+        apply_event(event, positions)
+    portfolio_valuation.sync(positions)
+    if alert_engine:
+        alert_monitor.start()
+    return len(events)
+
+
+def open_session(positions: Dict[str, Dict], profile: Optional[str] = None):
+    global journal, current_profile
+    current_profile = profile or read_active_profile()
+    journal = profile_journal(current_profile)
+    activate_profile(positions)
+    atexit.register(close_session, positions)
+
+
+def activate_profile(positions: Dict[str, Dict]) -> int:
+    if current_profile != DEFAULT_PROFILE:
+        os.makedirs(os.path.dirname(journal.path), exist_ok=True)
+    replayed = load_session(positions)
+    journal.open()
+    if journal.needs_compaction():
+        journal.compact(session_state(positions))
+    return replayed
+
+
+def switch_profile(positions: Dict[str, Dict], name: Optional[str] = None):
+    # Only the active profile lives in memory. The outgoing one is compacted into its snapshot, so
+    # switching back restores that instead of replaying its journal; the quote cache, bars and rate
+    # limiter are shared.
+    global journal, current_profile
+    if name is None:
+        print(f"Current profile: {current_profile}")
+        return
+    if not valid_profile_name(name):
+        print("Profile names use letters, digits, - and _ (up to 64 characters).")
+        return False
+    if name == current_profile:
+        print(f"Already on profile: {name}")
+        return
+    unpark_alerts(name)
+    previous, previous_name = journal, current_profile
+    created = name != DEFAULT_PROFILE and not os.path.isdir(os.path.join(PROFILE_DIR, name))
+    if previous.seq > previous.snapshot_seq:
+        previous.compact(session_state(positions))
+    previous.close()
     try:
-        with open('portfolio_save.json', 'r') as f:
-            data = json.load(f)
-        print("Portfolio and favourites loaded.")
-        return data.get('positions', {}), set(data.get('favourites', []))
+        current_profile, journal = name, profile_journal(name)
+        activate_profile(positions)
+        write_active_profile(name)
+    except Exception as e:
+        print(f"Could not switch profile: {e}")
+        current_profile, journal = previous_name, previous
+        activate_profile(positions)
+        return False
+    if alert_engine:
+        alert_monitor.start()
+    print(f"Switched to profile: {name}{' (new)' if created else ''}")
+
+
+def park_alerts(name: str) -> Tuple[AlertEngine, Journal]:
+    # Rebuilds just the alerts of an inactive profile from its journal, which stays open for firings.
+    engine = AlertEngine()
+    files = profile_journal(name)
+    snapshot, events = files.load()
+    for alert in (snapshot or {}).get('alerts', []):
+        engine.restore(alert)
+    for event in events:
+        kind = event.get('type')
+        if kind == 'alert_add':
+            engine.restore(event['alert'])
+        elif kind == 'alert_remove':
+            engine.remove(event['id'])
+        elif kind == 'alert_clear':
+            engine.clear()
+    files.open()
+    return engine, files
+
+
+def unpark_alerts(name: str):
+    parked = parked_alerts.pop(name, None)
+    if parked is not None:
+        parked[1].close()
+
+
+def park_profiles(names: Set[str]):
+    # Keeps exactly the given profiles, other than the active one, monitored in the background.
+    for name in list(parked_alerts):
+        if name not in names or name == current_profile:
+            unpark_alerts(name)
+    for name in names - set(parked_alerts) - {current_profile}:
+        try:
+            parked_alerts[name] = park_alerts(name)
+        except (OSError, ValueError) as e:
+            print(f"Cannot monitor alerts of profile {name}: {e}", file=sys.stderr)
+    if any(engine for engine, _ in parked_alerts.values()):
+        alert_monitor.start()
+
+
+def list_profiles():
+    for name in saved_profiles():
+        files = profile_journal(name)
+        size = sum(os.path.getsize(p) for p in (files.path, files.snapshot_path) if os.path.exists(p))
+        marker = '*' if name == current_profile else ' '
+        print(f" {marker} {name:<24} {size / 1024:8.1f} KB on disk")
+
+
+def close_session(positions: Dict[str, Dict]):
+    if journal.is_open():
+        journal.compact(session_state(positions))
+        journal.close()
+
+
+def maybe_compact(positions: Dict[str, Dict]):
+    if journal.is_open() and journal.needs_compaction():
+        journal.compact(session_state(positions))
+
+
+def save_data(positions):
+    try:
+        journal.compact(session_state(positions))
+        print("Session state saved.")
+    except Exception as e:
+        print(f"Save failed: {e}")
+
+def load_data(positions):
+    try:
+        replayed = load_session(positions)
+        print(f"Session state loaded ({replayed} journal events replayed).")
     except Exception as e:
         print(f"Load failed: {e}")
-        return {}, set()
+
+def export_all(positions, target: str = "tradecli_export", fmt: str = 'csv'):
+    # A .json target is a single-file dump of the whole session; anything else is a directory holding
+    # session.json for the small state plus one streamed file per dataset.
+    try:
+        if target.endswith('.json'):
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump(session_state(positions), f)
+        else:
+            os.makedirs(target, exist_ok=True)
+            state = session_state(positions)
+            for key in ('positions', 'notes', 'trade_history'):
+                state.pop(key)
+            with open(os.path.join(target, 'session.json'), 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            for dataset in EXPORT_DATASETS:
+                path = os.path.join(target, dataset + EXPORT_EXTENSIONS[fmt])
+                print(f"  {dataset}: {write_dataset(dataset, path, positions)} rows")
+        print(f"All data exported to {target}")
+    except Exception as e:
+        print(f"Export failed: {e}")
+        return False
+
+def import_all(positions, target: str = "tradecli_export"):
+    try:
+        if target.endswith('.json'):
+            with open(target, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            files = []
+        else:
+            with open(os.path.join(target, 'session.json'), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            files = [(dataset, os.path.join(target, name)) for name in sorted(os.listdir(target))
+                     for dataset in [os.path.splitext(name)[0]]
+                     if dataset in EXPORT_DATASETS and os.path.splitext(name)[1] in EXPORT_EXTENSIONS.values()]
+        # Every file is read and validated before the current session is replaced.
+        loaded = [(dataset, read_dataset(dataset, path)) for dataset, path in files]
+        reset_session(positions)
+        restore_session(state, positions)
+        for dataset, rows in loaded:
+            apply_dataset(dataset, rows, positions)
+            print(f"  {dataset}: {len(rows)} rows")
+        finish_import(positions)
+        if alert_engine:
+            alert_monitor.start()
+        print(f"All data imported from {target}")
+    except Exception as e:
+        print(f"Import failed: {e}")
+        return False
+
+
+EXPORT_DATASETS = {
+    'positions': (('ticker', 'qty', 'cost', 'price', 'value'), 'sifff'),
+    'trades': (('time', 'side', 'ticker', 'qty', 'price'), 'fssif'),
+    'notes': (('ticker', 'note'), 'ss'),
+    'series': (('ticker', 'time', 'price'), 'sff'),
+    'bars': (('symbol', 'interval', 'ts', 'open', 'high', 'low', 'close', 'volume'), 'ssifffff'),
+}
+EXPORT_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'col': '.col'}
+PORTFOLIO_CSV_COLUMNS = ("Ticker", "Shares", "Avg Cost", "Current Price", "Market Value")
+IMPORT_ERROR_LIMIT = 10
+
+
+def dataset_rows(dataset: str, positions: Dict[str, Dict]):
+    if dataset == 'positions':
+        # Every quote is fetched in one concurrent batch before the first row is written.
+        prices = get_market_prices(positions)
+        for ticker, pos in list(positions.items()):
+            price = prices.get(ticker, 0.0)
+            yield ticker, pos['qty'], round(pos['cost'], 2), price, round(price * pos['qty'], 2)
+    elif dataset == 'trades':
+        for trade in trade_history:
+            yield trade['time'], trade['side'], trade['ticker'], trade['qty'], trade['price']
+    elif dataset == 'notes':
+        for ticker, notes in list(ticker_notes.items()):
+            for note in notes:
+                yield ticker, note
+    elif dataset == 'series':
+        for ticker, series in list(market_data.items()):
+            for ts, price in zip(itertools.chain(*series.time_views()), itertools.chain(*series.price_views())):
+                yield ticker, ts, price
+    elif dataset == 'bars':
+        yield from bar_store.iter_all()
+
+
+def write_dataset(dataset: str, path: str, positions: Dict[str, Dict]) -> int:
+    import dataio
+    columns, types = EXPORT_DATASETS[dataset]
+    return dataio.write_rows(path, columns, types, dataset_rows(dataset, positions))
+
+
+def check_row(dataset: str, row: tuple) -> Optional[str]:
+    if dataset == 'positions':
+        ticker, qty, cost = row[:3]
+        if not ticker or qty <= 0 or cost < 0:
+            return "needs a ticker, a positive qty and a non-negative cost"
+    elif dataset == 'trades':
+        if row[1] not in ('buy', 'sell') or not row[2] or row[3] <= 0 or row[4] <= 0:
+            return "needs side buy/sell, a ticker, a positive qty and price"
+    elif dataset == 'notes':
+        if not row[0]:
+            return "needs a ticker"
+    elif dataset == 'series':
+        if not row[0] or row[2] <= 0:
+            return "needs a ticker and a positive price"
+    elif dataset == 'bars':
+        if not row[0] or row[1] not in CHART_INTERVALS or row[4] < row[5]:
+            return "needs a symbol, a known interval and high >= low"
+    return None
+
+
+def read_dataset(dataset: str, path: str) -> List[tuple]:
+    import dataio
+    columns, types = EXPORT_DATASETS[dataset]
+    rows, errors = [], []
+    for number, row, error in dataio.read_rows(path, columns, types):
+        problem = error or check_row(dataset, row)
+        if problem is None:
+            rows.append(row)
+        elif len(errors) < IMPORT_ERROR_LIMIT:
+            errors.append(problem if error else f"row {number}: {problem}")
+        else:
+            errors.append(None)
+    if errors:
+        shown = [e for e in errors if e]
+        more = len(errors) - len(shown)
+        raise ValueError(f"{path}: " + "; ".join(shown) + (f" (and {more} more)" if more else ""))
+    return rows
+
+
+def apply_dataset(dataset: str, rows: List[tuple], positions: Dict[str, Dict]):
+    if dataset == 'positions':
+        for ticker, qty, cost, _, _ in rows:
+            positions[ticker.upper()] = {'qty': qty, 'cost': cost}
+    elif dataset == 'trades':
+        # Trades already in the history are skipped, so importing the same file twice is harmless.
+        seen = {(t['time'], t['side'], t['ticker'], t['qty'], t['price']) for t in trade_history}
+        for t, side, ticker, qty, price in rows:
+            key = (t, side, ticker.upper(), qty, price)
+            if key not in seen:
+                seen.add(key)
+                trade_history.append({'time': t, 'side': side, 'ticker': key[2], 'qty': qty, 'price': price})
+        trade_history.sort(key=lambda trade: trade['time'])
+    elif dataset == 'notes':
+        # The file replaces the notes of every ticker it mentions.
+        imported: Dict[str, List[str]] = {}
+        for ticker, note in rows:
+            imported.setdefault(ticker.upper(), []).append(note)
+        ticker_notes.update(imported)
+    elif dataset == 'series':
+        for ticker, ts, price in sorted(rows, key=lambda r: r[1]):
+            record_price(ticker.upper(), price, ts)
+    elif dataset == 'bars':
+        grouped: Dict[Tuple[str, str], List[Tuple]] = {}
+        for row in rows:
+            grouped.setdefault((row[0].upper(), row[1]), []).append(row[2:])
+        for (symbol, interval), bars in grouped.items():
+            bar_store.upsert(symbol, interval, bars, synced=False)
+
+
+def finish_import(positions: Dict[str, Dict]):
+    portfolio_valuation.sync(positions)
+    # Bulk imports bypass the event journal, so the result is snapshotted straight away.
+    if journal.is_open():
+        journal.compact(session_state(positions))
+
+
+def export_dataset(positions, dataset: str, path: str = ''):
+    path = path or f"{dataset}.csv"
+    try:
+        count = write_dataset(dataset, path, positions)
+    except Exception as e:
+        print(f"Export failed: {e}")
+        return False
+    print(f"Exported {count} {dataset} rows to {path}")
+
+
+def import_dataset(positions, dataset: str, path: str):
+    try:
+        rows = read_dataset(dataset, path)
+    except Exception as e:
+        print(f"Import failed: {e}")
+        return False
+    apply_dataset(dataset, rows, positions)
+    finish_import(positions)
+    print(f"Imported {len(rows)} {dataset} rows from {path}")
 
 def add_note(ticker: str, note: str):
     ticker = ticker.upper()
     if ticker not in ticker_notes:
         ticker_notes[ticker] = []
     ticker_notes[ticker].append(note)
+    record_event('note', ticker=ticker, note=note)
     print(f"Note added for {ticker}.")
 
 def show_notes(ticker: str):
@@ -467,12 +2203,10 @@ def diversification_analysis(positions):
     if not positions:
         print("No positions to analyze.")
         return
-    total = sum(get_market_price(t) * p['qty'] for t, p in positions.items())
+    get_market_prices(positions)
     print("Portfolio Diversification:")
-    for t, p in positions.items():
-        value = get_market_price(t) * p['qty']
-        percent = (value / total) * 100 if total else 0
-        print(f"  {t}: {percent:.2f}% of portfolio")
+    for t in positions:
+        print(f"  {t}: {portfolio_valuation.weight(t) * 100:.2f}% of portfolio")
 
 def suggest_ticker():
     tickers = list(market_data.keys()) or ["AAPL", "TSLA", "GOOGL", "MSFT", "BTCUSD", "ETHUSD"]
@@ -481,7 +2215,7 @@ def suggest_ticker():
 def show_news():
     print("Market News Headlines:")
     try:
-        r = requests.get("https://newsapi.org/v2/top-headlines?category=business&apiKey=demo", timeout=10)
+        r = http_get("https://newsapi.org/v2/top-headlines", params={"category": "business", "apiKey": "demo"})
         data = r.json()
         for a in data.get('articles', [])[:5]:
             print(f"- {a.get('title')}")
@@ -494,23 +2228,41 @@ def show_command_history():
         print(cmd)
 
 def clear_all_alerts():
-    market_data['alerts'] = []
-    market_data['alerts_pct'] = []
+    alert_engine.clear()
+    record_event('alert_clear')
     print("All alerts cleared.")
 
-def show_candlestick_chart(ticker: str):
-    print(f"ASCII Candlestick Chart for {ticker} (feature coming soon)")
+def show_candlestick_chart(ticker: str, interval: str = 'day', count: Optional[int] = None):
+    charts = load_charts()
+    if charts is None:
+        print("Candlestick charts need numpy: pip install numpy")
+        return False
+    ticker = ticker.upper()
+    interval = chart_interval(interval)
+    try:
+        sync_bars(ticker, interval)
+    except Exception as e:
+        print(f"Chart error: {e}")
+        return False
+    bars = bar_store.load(ticker, interval, limit=count)
+    if not bars:
+        print(f"No chart data for {ticker}.")
+        return False
+    sys.stdout.write(charts.render_candles(f"{ticker} {CHART_INTERVALS[interval][3]} candles", *charts.columns(bars),
+                                           width=terminal_width(), colour=sys.stdout.isatty()))
 
 
 def add_to_watchlist(ticker: str):
     ticker = ticker.upper()
     watchlist.add(ticker)
+    record_event('watch', ticker=ticker, on=True)
     print(f"Added {ticker} to watchlist.")
 
 def remove_from_watchlist(ticker: str):
     ticker = ticker.upper()
     if ticker in watchlist:
         watchlist.remove(ticker)
+        record_event('watch', ticker=ticker, on=False)
         print(f"Removed {ticker} from watchlist.")
     else:
         print(f"{ticker} not in watchlist.")
@@ -524,7 +2276,192 @@ def show_watchlist():
             print(f"- {t}")
 
 
-def convert_portfolio(currency: str, positions):
+def watch_tickers(source: str, positions: Dict[str, Dict]) -> List[str]:
+    if source == 'positions':
+        return sorted(positions)
+    return sorted(favourites if source == 'favourites' else watchlist)
+
+
+@contextmanager
+def key_reader():
+    # Yields wait(timeout), which returns True once a key is pressed. On POSIX the terminal stays in
+    # cbreak mode (no echo, no line buffering) until the block exits.
+    try:
+        import termios
+        import tty
+    except ImportError:
+        import msvcrt
+
+        def wait(timeout: float) -> bool:
+            deadline = time.monotonic() + timeout
+            while not msvcrt.kbhit():
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+            msvcrt.getwch()
+            return True
+        yield wait
+        return
+    import select
+    fd = sys.stdin.fileno()
+    saved = termios.tcgetattr(fd)
+    tty.setcbreak(fd)
+
+    def wait(timeout: float) -> bool:
+        ready, _, _ = select.select([fd], [], [], max(0.0, timeout))
+        if ready:
+            os.read(fd, 64)
+        return bool(ready)
+    try:
+        yield wait
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+
+class WatchBoard:
+    # Remembers the text and colour of every cell on screen, so a frame only rewrites the cells that
+    # changed instead of reprinting the table.
+    COLUMNS = (('Ticker', 9, '<'), ('Price', 12, '>'), ('Change', 11, '>'), ('Change %', 9, '>'))
+    HOLDING_COLUMNS = (('Qty', 10, '>'), ('Value', 14, '>'), ('P/L', 13, '>'))
+
+    def __init__(self, source: str, tickers: List[str], positions: Dict[str, Dict], interval: float):
+        self.source = source
+        self.tickers = tickers
+        self.positions = positions if source == 'positions' else {}
+        self.interval = interval
+        self.columns = self.COLUMNS + (self.HOLDING_COLUMNS if self.positions else ())
+        self.starts = list(itertools.accumulate([1] + [width + 1 for _, width, _ in self.columns]))[:-1]
+        self.prices: Dict[str, float] = {}
+        self.opening: Dict[str, float] = {}
+        # +1/-1 for tickers that moved in the latest update; they are drawn bold until the next one.
+        self.moves: Dict[str, int] = {}
+        self.updated = ''
+        self.notice = ''
+        self.screen: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        self.size = None
+
+    def update(self, prices: Dict[str, float]):
+        for ticker, price in prices.items():
+            if not price:
+                continue
+            previous = self.prices.get(ticker)
+            self.moves[ticker] = 0 if previous is None else (price > previous) - (price < previous)
+            self.prices[ticker] = price
+            self.opening.setdefault(ticker, price)
+        self.updated = datetime.datetime.now().strftime('%H:%M:%S')
+
+    def row(self, ticker: str) -> List[Tuple[str, str]]:
+        price = self.prices.get(ticker)
+        if price is None:
+            return [(ticker, '')] + [('-', '')] * (len(self.columns) - 1)
+        change = price - self.opening[ticker]
+        trend = GREEN if change > 0 else RED if change < 0 else ''
+        move = self.moves.get(ticker, 0)
+        flash = BOLD + (GREEN if move > 0 else RED) if move else ''
+        cells = [(ticker, flash), (f"{price:,.2f}", flash), (f"{change:+,.2f}", trend),
+                 (f"{change / self.opening[ticker] * 100:+.2f}%", trend)]
+        if self.positions:
+            pos = self.positions[ticker]
+            value = price * pos['qty']
+            pnl = value - pos['cost']
+            cells += [(f"{pos['qty']:g}", ''), (f"{value:,.2f}", ''),
+                      (f"{pnl:+,.2f}", GREEN if pnl > 0 else RED if pnl < 0 else '')]
+        return cells
+
+    def cells(self, columns: int) -> Dict[Tuple[int, int], Tuple[str, str]]:
+        # (row, column) -> (text, colour) of the whole table as it should look now, clipped to the terminal.
+        cells: Dict[Tuple[int, int], Tuple[str, str]] = {}
+
+        def put(row: int, col: int, text: str, colour: str = ''):
+            if col <= columns:
+                cells[(row, col)] = (text[:columns - col + 1], colour)
+        put(1, 1, f"Watching {self.source} ({len(self.tickers)}), every {self.interval:g}s; "
+                  f"changes are since the watch started. Press any key to stop.".ljust(columns), BOLD)
+        for (name, width, align), col in zip(self.columns, self.starts):
+            put(3, col, f"{name:{align}{width}}", BOLD)
+        shown = self.visible()
+        for i, ticker in enumerate(shown):
+            for (_, width, align), col, (text, colour) in zip(self.columns, self.starts, self.row(ticker)):
+                put(4 + i, col, f"{text[:width]:{align}{width}}", colour)
+        status = f"Updated {self.updated}" if self.updated else "Fetching quotes..."
+        if len(shown) < len(self.tickers):
+            status += f"  (+{len(self.tickers) - len(shown)} more rows than fit)"
+        if self.notice:
+            status += f"  {self.notice}"
+        put(5 + len(shown), 1, status.ljust(columns))
+        return cells
+
+    def visible(self) -> List[str]:
+        # Only the rows that fit are fetched, so a long list does not spend quota on hidden tickers.
+        lines = self.size.lines if self.size else 24
+        return self.tickers[:max(1, lines - 5)]
+
+    def frame(self) -> str:
+        import shutil
+        size = shutil.get_terminal_size((80, 24))
+        out = []
+        if size != self.size:
+            self.size = size
+            self.screen = {}
+            out.append("\033[H\033[2J")
+        wanted = self.cells(size.columns)
+        for (row, col), (text, colour) in wanted.items():
+            if self.screen.get((row, col)) != (text, colour):
+                out.append(f"\033[{row};{col}H{colour}{text}{RESET if colour else ''}")
+        self.screen = wanted
+        return ''.join(out)
+
+
+def watch_command(positions: Dict[str, Dict], source: str = 'watchlist', seconds: float = WATCH_INTERVAL):
+    global notice_sink
+    tickers = watch_tickers(source, positions)
+    if not tickers:
+        print(f"Nothing to watch: {source} is empty.")
+        return False
+    if not (sys.stdin.isatty() and sys.stdout.isatty()):
+        print("watch needs an interactive terminal.")
+        return False
+    interval = max(WATCH_MIN_INTERVAL, seconds)
+    board = WatchBoard(source, tickers, positions, interval)
+    from concurrent.futures import ThreadPoolExecutor
+    # Quotes are fetched off the drawing thread, so a slow or rate-limited batch never delays a keypress.
+    pool = ThreadPoolExecutor(max_workers=1)
+    pending = None
+    next_tick = time.monotonic()
+    previous_sink = notice_sink
+    notice_sink = lambda message, profile: setattr(board, 'notice', message)
+    # Alternate screen with the cursor hidden; leaving it restores the scrollback untouched.
+    sys.stdout.write("\033[?1049h\033[?25l")
+    try:
+        with key_reader() as key_pressed:
+            while True:
+                if pending is not None and pending.done():
+                    try:
+                        board.update(pending.result())
+                    except Exception as e:
+                        board.notice = f"Refresh failed: {e}"
+                    pending = None
+                frame = board.frame()
+                if frame:
+                    sys.stdout.write(frame)
+                    sys.stdout.flush()
+                now = time.monotonic()
+                if pending is None and now >= next_tick:
+                    # Half a tick of slack so a quote cached just after the last tick is still refetched.
+                    pending = pool.submit(get_market_prices, board.visible(), None, PRIORITY_DASHBOARD, interval / 2)
+                    next_tick = now + interval
+                if key_pressed(min(0.25, max(0.0, next_tick - time.monotonic()))):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        notice_sink = previous_sink
+        pool.shutdown(wait=False)
+        sys.stdout.write("\033[?25h\033[?1049l")
+        sys.stdout.flush()
+
+
+def convert_portfolio(positions, currency: str):
     print(f"Portfolio value in {currency.upper()} (feature coming soon)")
 
 def suggest_rebalance(positions):
@@ -556,24 +2493,178 @@ def import_notes():
         with open('notes_export.json', 'r') as f:
             notes = json.load(f)
         ticker_notes.update(notes)
+        for ticker, ticker_list in notes.items():
+            record_event('notes', ticker=ticker, notes=ticker_list)
         print("Notes imported.")
     except Exception as e:
         print(f"Import failed: {e}")
 
 def set_default_dashboard(tickers):
-    market_data['dashboard_custom'] = [t.upper() for t in tickers]
-    print(f"Default dashboard set to: {', '.join(market_data['dashboard_custom'])}")
+    global dashboard_custom
+    dashboard_custom = [t.upper() for t in tickers]
+    record_event('dashboard', tickers=dashboard_custom)
+    print(f"Default dashboard set to: {', '.join(dashboard_custom)}")
+
+def load_indicators():
+    try:
+        import indicators
+    except ImportError:
+        print("Indicators need numpy: pip install numpy")
+        return None
+    return indicators
+
+
+# (ticker, interval, name, param) -> [timestamp of last closed bar fed in, indicator state]
+indicator_states: Dict[Tuple, List] = {}
+
+
+def indicator_value(ticker: str, name: str, param: int, interval: str = 'day') -> Optional[float]:
+    indicators = load_indicators()
+    if indicators is None:
+        return None
+    key = (ticker, interval, name, param)
+    entry = indicator_states.get(key)
+    bars = bar_store.load(ticker, interval, start=entry[0] + 1 if entry and entry[0] is not None else None)
+    if not bars:
+        return None
+    # The newest bar may still be forming, so it is only peeked, never fed into the state.
+    closed, current = bars[:-1], bars[-1]
+    if entry is None:
+        if name == 'atr':
+            state = indicators.ATRState(param, [(b[2], b[3], b[4]) for b in closed])
+        else:
+            state_type = {'sma': indicators.RollingMean, 'ema': indicators.EMAState, 'rsi': indicators.RSIState,
+                          'vol': indicators.VolatilityState}[name]
+            state = state_type(param, [b[4] for b in closed])
+        entry = indicator_states[key] = [None, state]
+    else:
+        state = entry[1]
+        for bar in closed:
+            if name == 'atr':
+                state.update(bar[2], bar[3], bar[4])
+            else:
+                state.update(bar[4])
+    if closed:
+        entry[0] = closed[-1][0]
+    if name == 'atr':
+        return state.peek(current[2], current[3], current[4])
+    return state.peek(current[4])
+
+
+def show_volatile(positions=None, count: int = 10, window: int = 20):
+    indicators = load_indicators()
+    if indicators is None:
+        return
+    universe = sorted(watchlist) or sorted(favourites | set(positions or {}))
+    if not universe:
+        print("Add tickers with 'addwatch' to rank them by volatility.")
+        return
+    stale = sync_daily_bars(universe)
+    if stale:
+        print(f"Could not refresh {', '.join(stale)}; using stored bars.")
+    closes = {t: [bar[4] for bar in bar_store.load(t, 'day', limit=window + 1)] for t in universe}
+    vols = indicators.realized_volatility(closes, window)
+    if not vols:
+        print("Not enough daily history to rank volatility.")
+        return
+    ranked = sorted(vols.items(), key=lambda item: item[1], reverse=True)
+    print(f"Most volatile tickers ({window}-day realized, annualized):")
+    for ticker, vol in ranked[:count]:
+        print(f"  {ticker}: {vol * 100:.1f}%")
+    missing = [t for t in universe if t not in vols]
+    if missing:
+        print(f"  (not enough history: {', '.join(missing)})")
+
+
+def load_backtest():
+    try:
+        import backtest
+    except ImportError:
+        print("Backtesting needs numpy: pip install numpy")
+        return None
+    return backtest
+
+
+def sync_daily_bars(tickers: List[str]) -> List[str]:
+    # Returns the tickers that could not be refreshed; whatever is stored for them is still used.
+    def sync(ticker):
+        try:
+            sync_bars(ticker, 'day', PRIORITY_POPULAR)
+        except Exception:
+            return ticker
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max(1, min(QUOTE_CONCURRENCY, len(tickers)))) as pool:
+        return [t for t in pool.map(sync, tickers) if t]
+
+
+def run_backtest(positions: Dict[str, Dict], strategy: str, args: List[str] = ()):
+    backtest = load_backtest()
+    if backtest is None:
+        return False
+    tickers = [a.upper() for a in args if '=' not in a]
+    options = dict(a.split('=', 1) for a in args if '=' in a)
+    try:
+        years = float(options.pop('years', 10))
+        cost = float(options.pop('cost', 0.1)) / 100
+        workers = int(options['workers']) if 'workers' in options else None
+        options.pop('workers', None)
+        grid = backtest.param_grid(strategy, options)
+    except ValueError as e:
+        print(f"Backtest: {e}")
+        return False
+    tickers = tickers or sorted(watchlist) or sorted(favourites | set(positions))
+    if not tickers:
+        print("Name tickers or add some with 'addwatch' to backtest them.")
+        return False
+    stale = sync_daily_bars(tickers)
+    if stale:
+        print(f"Could not refresh {', '.join(stale)}; using stored bars.")
+    start = int(time.time() - years * backtest.YEAR_SECONDS)
+    series = {}
+    for ticker in tickers:
+        bars = bar_store.load(ticker, 'day', start=start)
+        series[ticker] = ([b[0] for b in bars], [b[4] for b in bars])
+    started = time.perf_counter()
+    try:
+        result = backtest.run(series, strategy, grid, cost, workers)
+    except ValueError as e:
+        print(f"Backtest: {e}")
+        return False
+    elapsed = time.perf_counter() - started
+    baseline = backtest.run(series, 'hold', cost=cost, workers=1) if strategy != 'hold' else None
+    first, last = (datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).date() for ts in (result.start, result.end))
+    print(f"{backtest.STRATEGIES[strategy][0]}: {len(result.tickers)} tickers, {first} to {last}, "
+          f"{len(grid)} parameter sets in {elapsed:.2f}s on {result.workers} process(es)")
+    missing = [t for t in tickers if t not in result.per_ticker]
+    if missing:
+        print(f"  (no daily history: {', '.join(missing)})")
+    print(f"Equal-weight portfolio, {cost * 100:.2f}% per trade, best by Sharpe:")
+    print(f"  {'parameters':<26} {'CAGR':>8} {'max DD':>8} {'Sharpe':>7} {'trades':>7}")
+
+    def row(label, stats, i):
+        print(f"  {label:<26} {stats['cagr'][i] * 100:>7.1f}% {stats['maxdd'][i] * 100:>7.1f}% "
+              f"{stats['sharpe'][i]:>7.2f} {stats['trades'][i]:>7.1f}")
+    ranked = result.ranked()
+    for i in ranked[:10]:
+        row(result.label(i), result.portfolio, i)
+    if baseline is not None:
+        row("(buy and hold)", baseline.portfolio, 0)
+    if len(result.tickers) > 1:
+        best = ranked[0]
+        by_ticker = sorted(result.tickers, key=lambda t: result.per_ticker[t][2][best], reverse=True)
+        shown = by_ticker if len(by_ticker) <= 10 else by_ticker[:5] + by_ticker[-5:]
+        print(f"Per ticker with {result.label(best)}:")
+        for ticker in shown:
+            cagr, maxdd, sharpe, trades = result.per_ticker[ticker][:, best]
+            print(f"  {ticker:<26} {cagr * 100:>7.1f}% {maxdd * 100:>7.1f}% {sharpe:>7.2f} {trades:>7.0f}")
 
-def show_volatile():
-    print("Most volatile tickers (feature coming soon)")
 
 def show_top_volume():
     tickers_with_volume = []
-    for ticker in market_data:
-        url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={ALPHA_VANTAGE_KEY}"
+    for ticker in list(market_data):
+        params = {"function": "GLOBAL_QUOTE", "symbol": ticker}
         try:
-            r = requests.get(url, timeout=10)
-            data = r.json()
+            data = alpha_vantage_query(params) or {}
             volume = int(data.get("Global Quote", {}).get("06. volume", 0))
             tickers_with_volume.append((volume, ticker))
         except Exception:
@@ -589,47 +2680,190 @@ def show_top_volume():
 def show_sector_breakdown():
     print("Sector breakdown (feature coming soon)")
 
-def show_rsi(ticker: str):
-    print(f"RSI for {ticker} (feature coming soon)")
+def show_rsi(ticker: str, period: int = 14):
+    ticker = ticker.upper()
+    try:
+        sync_bars(ticker, 'day')
+    except Exception as e:
+        print(f"RSI error: {e}")
+        return
+    value = indicator_value(ticker, 'rsi', period)
+    if value is None:
+        print(f"Not enough daily history for RSI({period}) on {ticker}.")
+        return
+    zone = "overbought" if value >= 70 else "oversold" if value <= 30 else "neutral"
+    print(f"RSI({period}) for {ticker} (Daily): {value:.2f} ({zone})")
 
 def show_moving_average(ticker: str, window: int):
-    print(f"Moving average for {ticker} (window {window}) (feature coming soon)")
+    ticker = ticker.upper()
+    if window < 1:
+        print("Window must be a positive integer.")
+        return
+    try:
+        sync_bars(ticker, 'day')
+    except Exception as e:
+        print(f"Moving average error: {e}")
+        return
+    sma_value = indicator_value(ticker, 'sma', window)
+    ema_value = indicator_value(ticker, 'ema', window)
+    bars = bar_store.load(ticker, 'day', limit=1)
+    if sma_value is None or not bars:
+        print(f"Not enough daily history for a {window}-day moving average on {ticker}.")
+        return
+    close = bars[-1][4]
+    trend = "above" if close >= sma_value else "below"
+    print(f"Moving averages for {ticker} (Daily, window {window}):")
+    print(f"  SMA: {sma_value:.2f}  EMA: {ema_value:.2f}  Last close: {close:.2f} ({trend} SMA)")
+
 
+def show_atr(ticker: str, period: int = 14):
+    ticker = ticker.upper()
+    try:
+        sync_bars(ticker, 'day')
+    except Exception as e:
+        print(f"ATR error: {e}")
+        return
+    value = indicator_value(ticker, 'atr', period)
+    bars = bar_store.load(ticker, 'day', limit=1)
+    if value is None or not bars:
+        print(f"Not enough daily history for ATR({period}) on {ticker}.")
+        return
+    close = bars[-1][4]
+    share = f" ({value / close * 100:.2f}% of last close)" if close > 0 else ""
+    print(f"ATR({period}) for {ticker} (Daily): {value:.2f}{share}")
+
+def show_volatility(ticker: str, window: int = 20):
+    ticker = ticker.upper()
+    try:
+        sync_bars(ticker, 'day')
+    except Exception as e:
+        print(f"Volatility error: {e}")
+        return
+    value = indicator_value(ticker, 'vol', window)
+    if value is None:
+        print(f"Not enough daily history for {window}-day volatility on {ticker}.")
+        return
+    print(f"Realized volatility for {ticker} (Daily, {window}-day window, annualized): {value * 100:.2f}%")
 
 def schedule_alert(ticker: str, price: float, interval: str):
-    print(f"Scheduled alert for {ticker} at ${price} every {interval} (feature coming soon)")
+    ticker = ticker.upper()
+    try:
+        seconds = parse_interval(interval)
+    except ValueError:
+        print("Interval must look like 30s, 5m, 1h or a number of seconds.")
+        return
+    if seconds < ALERT_MIN_INTERVAL:
+        print(f"Interval must be at least {ALERT_MIN_INTERVAL:g}s.")
+        return
+    current = get_market_price(ticker, PRIORITY_ALERT)
+    if current == 0.0:
+        print("Failed to fetch a valid market price. Please try again later.")
+        return
+    if price >= current:
+        alert = alert_engine.add_above(ticker, price, seconds)
+        direction = 'above'
+    else:
+        alert = alert_engine.add_below(ticker, price, seconds)
+        direction = 'below'
+    watch_alert(alert)
+    print(f"Scheduled alert #{alert.id} for {ticker} {direction} ${price}, checked every {seconds:g}s")
 
 def analyze_risk(positions):
     print("Portfolio risk analysis (feature coming soon)")
 
-def create_macro(name: str, commands: str):
-    macros[name] = commands
-    print(f"Macro '{name}' saved.")
+def is_macro_param(token: str) -> bool:
+    return token[:1] == '$' and token[1:].isdigit() and token != '$0'
 
-def run_macro(name: str, positions):
-    if name in macros:
-        print(f"Running macro '{name}': {macros[name]}")
-        for cmd in macros[name].split(';'):
-            process_command(*cmd.strip().split(), positions)
-    else:
-        print(f"Macro '{name}' not found.")
 
-def switch_profile(name: str):
-    global current_profile
-    current_profile = name
-    print(f"Switched to profile: {name}")
+class Macro:
+    __slots__ = ('name', 'source', 'steps', 'params')
 
-def manage_apikeys():
-    print("API key management (feature coming soon)")
+    def __init__(self, name: str, source: str):
+        # Compiled once: every step is looked up and its arguments checked, with $1, $2, ... left for run time.
+        self.name = name
+        self.source = source
+        self.steps = []
+        self.params = 0
+        errors = []
+        for text in source.split(';'):
+            parts = text.split()
+            if not parts:
+                continue
+            command = commands.get(parts[0].lower())
+            if command is None:
+                errors.append(f"unknown command '{parts[0]}'")
+            elif command.needs_terminal(parts[1:], placeholders=True) or command.name in ('macro', 'runmacro'):
+                errors.append(f"'{command.name}' cannot be used in a macro")
+            else:
+                try:
+                    command.parse(parts[1:], placeholders=True)
+                except ValueError as e:
+                    errors.append(str(e))
+                self.steps.append((command, parts[1:]))
+                self.params = max([self.params] + [int(t[1:]) for t in parts[1:] if is_macro_param(t)])
+        if not self.steps and not errors:
+            errors.append("no commands")
+        if errors:
+            raise ValueError('; '.join(errors))
+
+    def bind(self, args: List[str]) -> List[Tuple["Command", list]]:
+        if len(args) < self.params:
+            raise ValueError(f"takes {self.params} argument(s), got {len(args)}")
+        return [(command, command.parse([args[int(t[1:]) - 1] if is_macro_param(t) else t for t in tokens]))
+                for command, tokens in self.steps]
+
+
+compiled_macros: Dict[str, Macro] = {}
+
+
+def compiled_macro(name: str) -> Optional[Macro]:
+    source = macros.get(name)
+    if source is None:
+        return None
+    macro = compiled_macros.get(name)
+    if macro is None or macro.source != source:
+        macro = compiled_macros[name] = Macro(name, source)
+    return macro
+
+
+def create_macro(name: str, source: str):
+    try:
+        compiled_macros[name] = Macro(name, source)
+    except ValueError as e:
+        print(f"Macro '{name}' not saved: {e}")
+        return False
+    macros[name] = source
+    record_event('macro', name=name, commands=source)
+    print(f"Macro '{name}' saved.")
 
-def export_all():
-    print("Exporting all data (feature coming soon)")
+def show_macros():
+    if not macros:
+        print("No macros defined.")
+    for name, source in macros.items():
+        print(f"  {name}: {source}")
 
-def import_all():
-    print("Importing all data (feature coming soon)")
+def run_macro(positions, name: str, args: List[str] = ()):
+    try:
+        macro = compiled_macro(name)
+        steps = macro.bind(list(args)) if macro else None
+    except ValueError as e:
+        print(f"Macro '{name}' {e}")
+        return False
+    if macro is None:
+        print(f"Macro '{name}' not found.")
+        return False
+    print(f"Running macro '{name}': {macro.source}")
+    prefetch_quotes(steps, positions)
+    for command, values in steps:
+        result = execute_command(command, list(values), positions)
+        if result is EXIT:
+            return EXIT
+        if result is False:
+            print(f"Macro '{name}' stopped at '{command.name}'.")
+            return False
 
-def tab_complete():
-    print("Tab completion suggestions (feature coming soon)")
+def manage_apikeys():
+    print("API key management (feature coming soon)")
 
 def change_theme(name: str):
     print(f"Theme changed to {name} (feature coming soon)")
@@ -649,328 +2883,1132 @@ def quick_start():
 def submit_feedback(message: str):
     print(f"Feedback submitted: {message}")
 
-def show_overlay(overlay_type: str, ticker: str):
-    print(f"Overlay {overlay_type} for {ticker} (feature coming soon)")
+def show_overlay(overlay_type: str, ticker: str, window: int = 20):
+    overlay_type = overlay_type.lower()
+    ticker = ticker.upper()
+    if overlay_type not in ('sma', 'ema', 'bollinger'):
+        print("Overlay type must be one of: sma, ema, bollinger")
+        return
+    indicators = load_indicators()
+    if indicators is None:
+        return
+    try:
+        sync_bars(ticker, 'day')
+    except Exception as e:
+        print(f"Overlay error: {e}")
+        return
+    bars = bar_store.load(ticker, 'day')
+    closes = [bar[4] for bar in bars]
+    if len(closes) < window:
+        print(f"Not enough daily history for a {window}-day {overlay_type} on {ticker}.")
+        return
+    if overlay_type == 'sma':
+        overlays = [(indicators.sma(closes, window), '-')]
+    elif overlay_type == 'ema':
+        overlays = [(indicators.ema(closes, window), '-')]
+    else:
+        lower, mid, upper = indicators.bollinger(closes, window)
+        overlays = [(lower, '.'), (mid, '-'), (upper, '.')]
+    print_ascii_chart(f"{ticker} Daily with {overlay_type.upper()}({window}) overlay", closes, overlays,
+                      stamps=[bar[0] for bar in bars])
 
 
-def process_command(command: str, args: List[str], positions: Dict[str, Dict]) -> bool:
-    global TRADING_MODE, favourites, watchlist, current_profile
-    command_history.append(' '.join([command] + args))
-    command = command.lower()
-
-    # Aliases
-    if command == 'q':
-        command = 'quote'
-    elif command == 'b':
-        command = 'buy'
-
-    if command == 'help':
-        print_help()
-    elif command == "setmode":
-        if len(args) != 1 or args[0].lower() not in ["dummy", "real"]:
-            print("Usage: setmode <dummy|real>")
-        else:
-            TRADING_MODE = args[0].lower()
-            print(f"Trading mode set to: {TRADING_MODE}")
-            if TRADING_MODE == "real":
-                print("Don't forget to run 'config' to configure your trading credentials.")
-    elif command == "config":
-        if TRADING_MODE != "real":
-            print("Configuration is only required for real trading mode.")
-        else:
-            configure_real_trading()
-    elif command == 'quote':
-        if len(args) != 1:
-            print("Usage: quote <ticker>")
-        else:
-            ticker = args[0].upper()
-            price = get_market_price(ticker)
-            print(f"Quote for {ticker}: ${price}")
-    elif command == 'buy':
-        if len(args) != 2:
-            print("Usage: buy <ticker> <qty>")
+def set_trading_mode(mode: str):
+    global TRADING_MODE
+    TRADING_MODE = mode
+    print(f"Trading mode set to: {TRADING_MODE}")
+    if TRADING_MODE == "real":
+        print("Don't forget to run 'config' to configure your trading credentials.")
+
+
+def configure_command():
+    if TRADING_MODE != "real":
+        print("Configuration is only required for real trading mode.")
+    else:
+        configure_real_trading()
+
+
+def show_quote(ticker: str):
+    price = get_market_price(ticker)
+    print(f"Quote for {ticker}: ${price}")
+    return price != 0.0
+
+
+def buy_shares(positions: Dict[str, Dict], ticker: str, qty: int):
+    price = get_market_price(ticker, PRIORITY_TRADE, TRADE_QUOTE_MAX_AGE)
+    if price == 0.0:
+        print("Failed to fetch a valid market price. Please try again later.")
+        return False
+    total_cost = round(price * qty, 2)
+    if TRADING_MODE == "real":
+        if not TRADING_CONFIG:
+            print("Please configure your trading platform by running 'config'.")
+            return False
+        place_real_order("buy", ticker, qty, price)
+        positions.setdefault(ticker, {"qty": 0, "cost": 0.0})
+        positions[ticker]['qty'] += qty
+        positions[ticker]['cost'] += total_cost
+    else:
+        if ticker in positions:
+            positions[ticker]['qty'] += qty
+            positions[ticker]['cost'] += total_cost
         else:
-            ticker = args[0].upper()
-            try:
-                qty = int(args[1])
-                if qty <= 0:
-                    raise ValueError
-            except ValueError:
-                print("Quantity must be a positive integer.")
-                return True
-            price = get_market_price(ticker)
-            if price == 0.0:
-                print("Failed to fetch a valid market price. Please try again later.")
-                return True
-            total_cost = round(price * qty, 2)
-            if TRADING_MODE == "real":
-                if not TRADING_CONFIG:
-                    print("Please configure your trading platform by running 'config'.")
-                    return True
-                place_real_order("buy", ticker, qty, price)
-                positions.setdefault(ticker, {"qty": 0, "cost": 0.0})
-                positions[ticker]['qty'] += qty
-                positions[ticker]['cost'] += total_cost
+            positions[ticker] = {"qty": qty, "cost": total_cost}
+        print(f"Bought {qty} shares of {ticker} at ${price}/share for ${total_cost}.")
+    record_trade(positions, 'buy', ticker, qty, price)
+    update_portfolio_history()
+
+
+def sell_shares(positions: Dict[str, Dict], ticker: str, qty: int):
+    if ticker not in positions or positions[ticker]['qty'] < qty:
+        print("Insufficient shares to sell.")
+        return False
+    price = get_market_price(ticker, PRIORITY_TRADE, TRADE_QUOTE_MAX_AGE)
+    if price == 0.0:
+        print("Failed to fetch a valid market price. Please try again later.")
+        return False
+    total_value = round(price * qty, 2)
+    avg_cost = positions[ticker]['cost'] / positions[ticker]['qty']
+    if TRADING_MODE == "real":
+        if not TRADING_CONFIG:
+            print("Please configure your trading platform by running 'config'.")
+            return False
+        place_real_order("sell", ticker, qty, price)
+    positions[ticker]['qty'] -= qty
+    positions[ticker]['cost'] -= avg_cost * qty
+    if positions[ticker]['qty'] == 0:
+        del positions[ticker]
+    if TRADING_MODE != "real":
+        print(f"Sold {qty} shares of {ticker} at ${price}/share for ${total_value}.")
+    record_trade(positions, 'sell', ticker, qty, price)
+    update_portfolio_history()
+
+
+def show_positions(positions: Dict[str, Dict]):
+    if not positions:
+        print("No positions held.")
+        return
+    print("Current Positions:")
+    prices = get_market_prices(positions)
+    unquoted = [t for t in positions if not prices.get(t)]
+    for ticker, pos in positions.items():
+        avg_cost = pos['cost'] / pos['qty']
+        if ticker in unquoted:
+            print(f"  {ticker}: {pos['qty']} shares (avg cost: ${avg_cost:.2f}, current: no quote)")
+            continue
+        current_price = portfolio_valuation.price(ticker)
+        unrealized = round((current_price - avg_cost) * pos['qty'], 2)
+        print(f"  {ticker}: {pos['qty']} shares (avg cost: ${avg_cost:.2f}, current: ${current_price}) -> P/L: ${unrealized}")
+    total = portfolio_valuation.unrealized - sum(portfolio_valuation.value(t) - positions[t]['cost'] for t in unquoted)
+    print(f"Total Unrealized P/L: ${round(total, 2)}" + (f" (excluding {', '.join(unquoted)}: no quote)" if unquoted else ""))
+
+
+def show_performance():
+    print("Performance summary (feature coming soon)")
+
+
+def notes_command(ticker: str, note: str = ''):
+    if note:
+        add_note(ticker, note)
+    else:
+        show_notes(ticker)
+
+
+def format_seconds(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def print_stats():
+    if not metrics.histograms and not metrics.counters:
+        print("No stats recorded yet." if metrics.enabled else "Stats are off. Use 'stats on' to record them.")
+        return
+    # net/run sums HTTP time across threads, so a command with concurrent fetches can exceed its wall time.
+    print(f"{'command':<16} {'runs':>6} {'p50':>9} {'p90':>9} {'max':>9} {'net/run':>9} {'fetch/run':>9} {'errors':>6}")
+    for name in metrics.labels('command'):
+        wall = metrics.histograms.get(('command', name))
+        if wall is None:
+            continue
+        network = metrics.histograms[('command_network', name)]
+        print(f"{name:<16} {wall.count:>6} {format_seconds(wall.quantile(0.5)):>9} "
+              f"{format_seconds(wall.quantile(0.9)):>9} {format_seconds(wall.max):>9} "
+              f"{format_seconds(network.total / network.count):>9} "
+              f"{metrics.counter('command_fetches', name) / wall.count:>9.1f} {metrics.counter('command_errors', name):>6}")
+    endpoints = metrics.labels('http')
+    if endpoints:
+        print(f"\n{'endpoint':<22} {'requests':>8} {'errors':>6} {'retries':>7} {'p50':>9} {'p90':>9} {'max':>9}")
+    for endpoint in endpoints:
+        latency = metrics.histograms.get(('http', endpoint)) or Histogram()
+        print(f"{endpoint:<22} {metrics.counter('http_requests', endpoint):>8} "
+              f"{metrics.counter('http_errors', endpoint):>6} {metrics.counter('http_retries', endpoint):>7} "
+              f"{format_seconds(latency.quantile(0.5)):>9} {format_seconds(latency.quantile(0.9)):>9} "
+              f"{format_seconds(latency.max):>9}")
+    lookups = {kind: metrics.counter('quote_cache', kind) for kind in ('snapshot', 'hit', 'stale', 'miss')}
+    total = sum(lookups.values())
+    if total:
+        served = total - lookups['miss']
+        print(f"\nQuote cache: {served / total:.0%} served without a fetch "
+              f"({', '.join(f'{n} {kind}' for kind, n in lookups.items())})")
+    wait = metrics.histograms.get(('limiter_wait', ''))
+    throttled = ', '.join(f"{metrics.counter('av_throttled', kind)} {kind}" for kind in metrics.labels('av_throttled'))
+    if wait or throttled:
+        print(f"Alpha Vantage: throttled {throttled or 'never'}, {metrics.counter('av_coalesced')} coalesced, "
+              f"limiter wait p90 {format_seconds(wait.quantile(0.9) if wait else 0)} "
+              f"max {format_seconds(wait.max if wait else 0)}")
+
+
+def write_stats(path: str):
+    text = metrics.prometheus() if path.endswith('.prom') else json.dumps(metrics.to_dict(), indent=1)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def stats_command(action: str = 'show', path: str = ''):
+    if action == 'show':
+        print_stats()
+    elif action == 'reset':
+        metrics.reset()
+        print("Stats cleared.")
+    elif action in ('on', 'off'):
+        metrics.enabled = action == 'on'
+        print(f"Stats recording {action}.")
+    elif action == 'json' and not path:
+        print(json.dumps(metrics.to_dict(), indent=1))
+    elif action == 'prom' and not path:
+        print(metrics.prometheus(), end='')
+    else:
+        if action == 'prom' and not path.endswith('.prom'):
+            path += '.prom'
+        try:
+            write_stats(path)
+        except OSError as e:
+            print(f"Cannot write stats: {e}")
+            return False
+        print(f"Stats written to {path}")
+
+
+def cprofile_command(positions: Dict[str, Dict], command_line: str):
+    import cProfile
+    import pstats
+    parts = command_line.split()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        keep_running = dispatch_command(parts[0], parts[1:], positions)
+    finally:
+        profiler.disable()
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(20)
+    if last_status != STATUS_OK:
+        return False
+    return None if keep_running else EXIT
+
+
+def profiled_interactive(values: list) -> bool:
+    # cprofile dispatches its command itself, so it needs a terminal whenever that command does.
+    parts = values[0].split()
+    command = commands.get(parts[0].lower())
+    if command is None:
+        return is_macro_param(parts[0])
+    return command.needs_terminal(parts[1:], placeholders=True)
+
+
+def exit_session():
+    print("Exiting TradeCLI. Goodbye!")
+    return EXIT
+
+
+# Returned by a handler to end the session.
+EXIT = object()
+
+# Status of the last dispatched command: 0 ok, 1 the handler reported a failure, 2 bad usage.
+STATUS_OK = 0
+STATUS_FAILED = 1
+STATUS_USAGE = 2
+last_status = STATUS_OK
+
+
+def positive_int(raw: str) -> int:
+    value = int(raw)
+    if value <= 0:
+        raise ValueError(raw)
+    return value
+
+
+def window_size(raw: str) -> int:
+    value = int(raw)
+    if value < 2:
+        raise ValueError(raw)
+    return value
+
+
+ARG_TYPES = {
+    'str': (str, "text"),
+    'ticker': (str.upper, "a ticker"),
+    'int': (int, "an integer"),
+    'posint': (positive_int, "a positive integer"),
+    'window': (window_size, "an integer of at least 2"),
+    'float': (float, "a number"),
+}
+
+
+class ArgSpec:
+    __slots__ = ('name', 'kind', 'choices', 'required', 'default', 'rest')
+
+    def __init__(self, token: str):
+        # <name[:type]>, [name[:type][=default]], with a trailing ... to take the rest of the line
+        # and a trailing * to take the remaining tokens as a list. A type of a|b|c is a choice.
+        self.required = token.startswith('<')
+        token = token.strip('<>[]')
+        self.rest = ''
+        if token.endswith('...'):
+            self.rest = 'join'
+        elif token.endswith('*'):
+            self.rest = 'list'
+        token = token.rstrip('.*')
+        token, _, default = token.partition('=')
+        self.name, _, kind = token.partition(':')
+        self.choices = kind.split('|') if '|' in kind else None
+        self.kind = 'str' if self.choices else kind or 'str'
+        self.default = self.convert(default) if default else ([] if self.rest == 'list' else None)
+
+    def convert(self, raw: str):
+        if self.choices is not None:
+            if raw.lower() not in self.choices:
+                raise ValueError(f"{self.name} must be one of: {', '.join(self.choices)}")
+            return raw.lower()
+        parse, description = ARG_TYPES[self.kind]
+        try:
+            return parse(raw)
+        except ValueError:
+            raise ValueError(f"{self.name} must be {description}.")
+
+    def usage(self) -> str:
+        label = '|'.join(self.choices) if self.choices else self.name
+        return f"<{label}>" if self.required else f"[{label}]"
+
+
+class Command:
+    __slots__ = ('name', 'handler', 'args', 'help', 'aliases', 'positions', 'quotes', 'interactive', 'files',
+                 'sets_mode')
+
+    def __init__(self, name: str, handler, spec: str = '', help: str = '', aliases: Tuple[str, ...] = (),
+                 positions: bool = False, quotes=None, interactive=False, files=False,
+                 sets_mode: bool = False):
+        self.name = name
+        self.handler = handler
+        self.args = [ArgSpec(token) for token in spec.split()]
+        self.help = help
+        self.aliases = aliases
+        self.positions = positions
+        # True when the handler quotes its ticker arguments, or a function (values, positions) -> tickers.
+        self.quotes = quotes
+        # Commands that prompt on stdin cannot run in batch mode. True, or a function (values) -> bool.
+        self.interactive = interactive
+        # True when the handler reads or writes files, or a function (values) -> bool for when it does.
+        # The daemon refuses these for its clients, since the files would be opened as the daemon's user.
+        self.files = files
+        # True when the handler changes the trading mode or credentials for every client of a daemon.
+        self.sets_mode = sets_mode
+
+    @property
+    def usage(self) -> str:
+        return ' '.join([self.name] + [a.usage() for a in self.args])
+
+    def touches_files(self, values: list) -> bool:
+        return bool(self.files(values) if callable(self.files) else self.files)
+
+    def needs_terminal(self, raw: List[str], placeholders: bool = False) -> bool:
+        if not callable(self.interactive):
+            return bool(self.interactive)
+        try:
+            return bool(self.interactive(self.parse(raw, placeholders)))
+        except ValueError:
+            # Bad arguments are reported as a usage error when the command runs.
+            return False
+
+    def quote_tickers(self, values: list, positions: Dict[str, Dict]) -> List[str]:
+        if not self.quotes:
+            return []
+        if callable(self.quotes):
+            return list(self.quotes(values, positions))
+        return [v for spec, v in zip(self.args, values) if spec.kind == 'ticker']
+
+    def parse(self, raw: List[str], placeholders: bool = False) -> list:
+        values = []
+        for i, spec in enumerate(self.args):
+            if spec.rest == 'list':
+                if spec.required and i >= len(raw):
+                    raise ValueError(f"Usage: {self.usage}")
+                values.append(raw[i:])
+                return values
+            if spec.rest == 'join':
+                if spec.required and i >= len(raw):
+                    raise ValueError(f"Usage: {self.usage}")
+                if i < len(raw):
+                    values.append(' '.join(raw[i:]))
+                return values
+            if i >= len(raw):
+                if spec.required:
+                    raise ValueError(f"Usage: {self.usage}")
+                if spec.default is None:
+                    # Leave the handler's own default in place.
+                    break
+                values.append(spec.default)
+            elif placeholders and is_macro_param(raw[i]):
+                values.append(raw[i])
             else:
-                if ticker in positions:
-                    positions[ticker]['qty'] += qty
-                    positions[ticker]['cost'] += total_cost
-                else:
-                    positions[ticker] = {"qty": qty, "cost": total_cost}
-                print(f"Bought {qty} shares of {ticker} at ${price}/share for ${total_cost}.")
-            update_portfolio_history(positions)
-    elif command == 'sell':
-        if len(args) != 2:
-            print("Usage: sell <ticker> <qty>")
-        else:
-            ticker = args[0].upper()
+                values.append(spec.convert(raw[i]))
+        if len(raw) > len(self.args):
+            raise ValueError(f"Usage: {self.usage}")
+        return values
+
+
+commands: Dict[str, Command] = {}
+command_order: List[Command] = []
+
+
+def register_command(name: str, handler, spec: str = '', help: str = '', aliases: Tuple[str, ...] = (),
+                     positions: bool = False, quotes=None, interactive=False, files=False,
+                     sets_mode: bool = False) -> Command:
+    command = Command(name, handler, spec, help, aliases, positions, quotes, interactive, files, sets_mode)
+    for key in (name,) + tuple(aliases):
+        commands[key] = command
+    command_order.append(command)
+    return command
+
+
+def print_help(name: Optional[str] = None):
+    if name:
+        command = commands.get(name.lower())
+        if command is None:
+            print(f"Unknown command: {name}")
+            return False
+        print(f"  {command.usage} - {command.help}")
+        if command.aliases:
+            print(f"  Aliases: {', '.join(command.aliases)}")
+        return
+    print(f"Available Commands:{RESET}")
+    for command in command_order:
+        names = ' / '.join((command.usage,) + command.aliases)
+        print(f"  {names:<22} - {command.help}")
+
+
+def complete_command(text: str, tokens: List[str]) -> List[str]:
+    if len(tokens) <= 1:
+        return sorted(name for name in commands if name.startswith(text.lower()))
+    command = commands.get(tokens[0].lower())
+    if command is None or not command.args:
+        return []
+    spec = command.args[min(len(tokens) - 2, len(command.args) - 1)]
+    if spec.choices:
+        return [c for c in spec.choices if c.startswith(text.lower())]
+    if spec.kind == 'ticker' or spec.rest == 'list':
+        known = set(market_data) | favourites | watchlist | set(portfolio_valuation.holdings)
+        return sorted(t for t in known if t.startswith(text.upper()))
+    return []
+
+
+def install_completion():
+    try:
+        import readline
+    except ImportError:
+        return
+
+    def completer(text, state):
+        tokens = readline.get_line_buffer()[:readline.get_endidx()].split()
+        if not text:
+            tokens.append('')
+        matches = complete_command(text, tokens)
+        return matches[state] if state < len(matches) else None
+
+    readline.set_completer(completer)
+    readline.parse_and_bind('tab: complete')
+
+
+def tab_complete(prefix: str = ''):
+    tokens = prefix.split() or ['']
+    matches = complete_command(tokens[-1], tokens)
+    print(f"Completions: {', '.join(matches) if matches else 'None'}")
+
+
+def held_tickers(values: list, positions: Dict[str, Dict]) -> List[str]:
+    return list(positions)
+
+
+def alert_ticker(values: list, positions: Dict[str, Dict]) -> List[str]:
+    return [t.upper() for t in values[0][:1]]
+
+
+def macro_tickers(values: list, positions: Dict[str, Dict],
+                  defined: Optional[Dict[str, Macro]] = None) -> List[str]:
+    # defined holds macros from earlier in the same script, which are not saved yet when it is prefetched.
+    try:
+        macro = defined[values[0]] if defined and values[0] in defined else compiled_macro(values[0])
+        steps = macro.bind(values[1] if len(values) > 1 else []) if macro else []
+    except ValueError:
+        return []
+    return [t for command, step_values in steps for t in command.quote_tickers(step_values, positions)]
+
+
+def popular_tickers(values: list, positions: Dict[str, Dict]) -> List[str]:
+    return POPULAR_PAIRS
+
+
+def load_plugins():
+    # Modules listed in TRADECLI_PLUGINS define register(register_command) to add their own commands.
+    for name in filter(None, os.environ.get('TRADECLI_PLUGINS', '').split(',')):
+        try:
+            importlib.import_module(name.strip()).register(register_command)
+        except Exception as e:
+            print(f"Plugin {name} failed to load: {e}")
+
+
+register_command('help', print_help, '[command]', "Show this help message")
+register_command('quote', show_quote, '<ticker:ticker>', "Get the current market quote for the ticker", ('q',), quotes=True)
+register_command('buy', buy_shares, '<ticker:ticker> <qty:posint>', "Buy specified number of shares", ('b',), positions=True, quotes=True)
+register_command('sell', sell_shares, '<ticker:ticker> <qty:posint>', "Sell specified number of shares", positions=True, quotes=True)
+register_command('positions', show_positions, '', "Show current holdings and profit/loss", positions=True, quotes=held_tickers)
+register_command('chart', show_chart, '<ticker:ticker> [interval=5min] [count:posint]',
+                 "Price history chart (day|hour|4hour|minute|5min), all stored bars fitted to the terminal")
+register_command('candlestick', show_candlestick_chart, '<ticker:ticker> [interval=day] [count:posint]',
+                 "OHLC candlesticks with volume, bucketed to the terminal width", ('candles',))
+register_command('overlay', show_overlay, '<type:sma|ema|bollinger> <ticker:ticker> [window:window=20]', "Chart with an indicator overlay")
+register_command('dashboard', dashboard_summary, '[filter:gainers|losers|all]', "Show customizable dashboard summary", positions=True,
+                 quotes=held_tickers)
+register_command('customize', customize_dashboard, '', "Customize dashboard", interactive=True)
+register_command('setdashboard', set_default_dashboard, '<tickers*>', "Set the default dashboard tickers")
+register_command('analytics', show_analytics, '', "Show advanced analytics")
+register_command('alert', set_alert, '[args*]', "Set a price alert: [ticker] [above|below] [price]", quotes=alert_ticker)
+register_command('alertpct', set_percentage_alert, '[args*]', "Alert when price moves by a percentage: [ticker] [percent]",
+                 quotes=alert_ticker)
+register_command('alerttrail', set_trailing_alert, '[args*]', "Trailing alert off the session peak: [ticker] [percent]",
+                 quotes=alert_ticker)
+register_command('schedulealert', schedule_alert, '<ticker:ticker> <price:float> <interval>', "Alert polled in the background (e.g. 30s, 5m)",
+                 quotes=True)
+register_command('alerts', show_alerts, '', "List active alerts")
+register_command('removealert', remove_alert, '<id>', "Remove an alert")
+register_command('clearalerts', clear_all_alerts, '', "Remove all alerts")
+register_command('popular', show_popular_pairs, '', "Show popular trading pairs/tickers with price and holding",
+                 positions=True, quotes=popular_tickers)
+register_command('gainers', show_gainers_losers, '', "Show top gainers and losers")
+register_command('lasttrade', show_last_trade_time, '', "Show last trade time for tickers")
+register_command('screener', show_screener, '', "Run the price screener")
+register_command('rsi', show_rsi, '<ticker:ticker> [period:window=14]', "Relative strength index from daily bars")
+register_command('ma', show_moving_average, '<ticker:ticker> <window:posint>', "Simple and exponential moving averages")
+register_command('atr', show_atr, '<ticker:ticker> [period:window=14]', "Average true range from daily bars")
+register_command('vol', show_volatility, '<ticker:ticker> [window:window=20]', "Annualized realized volatility from daily bars")
+register_command('volatile', show_volatile, '[count:posint=10]', "Rank the watchlist by realized volatility", positions=True)
+register_command('backtest', run_backtest, '<strategy:hold|ma|rsi> [args*]',
+                 "Backtest daily bars: tickers plus name=values grids, years=N, cost=PCT", positions=True)
+register_command('topvolume', show_top_volume, '', "Show top volume tickers")
+register_command('sectorbreakdown', show_sector_breakdown, '', "Show sector breakdown")
+register_command('favourite', add_favourite, '<ticker:ticker>', "Add a ticker to favourites")
+register_command('removefav', remove_favourite, '', "Remove a ticker from favourites", interactive=True)
+register_command('favourites', show_favourites, '', "List favourite tickers")
+register_command('addwatch', add_to_watchlist, '<ticker:ticker>', "Add a ticker to the watchlist")
+register_command('removewatch', remove_from_watchlist, '<ticker:ticker>', "Remove a ticker from the watchlist")
+register_command('watchlist', show_watchlist, '', "Show the watchlist")
+register_command('watch', watch_command, '[source:watchlist|favourites|positions] [seconds:float]',
+                 "Live quote table, redrawn in place every few seconds until a key is pressed",
+                 positions=True, interactive=True)
+register_command('notes', notes_command, '<ticker:ticker> [note...]', "Show notes for a ticker, or add one")
+register_command('exportnotes', export_notes, '', "Export notes", files=True)
+register_command('importnotes', import_notes, '', "Import notes", files=True)
+register_command('history', show_portfolio_history, '', "Show portfolio value history")
+register_command('historycmds', show_command_history, '', "Show this session's commands")
+register_command('performance', show_performance, '', "Performance summary")
+register_command('diversify', diversification_analysis, '', "Show portfolio diversification", positions=True, quotes=held_tickers)
+register_command('rebalance', suggest_rebalance, '', "Suggest a rebalance", positions=True)
+register_command('risk', analyze_risk, '', "Portfolio risk analysis", positions=True)
+register_command('dividends', simulate_dividends, '', "Simulate dividend payouts", positions=True)
+register_command('convert', convert_portfolio, '<currency>', "Portfolio value in another currency", positions=True)
+register_command('sessionpl', show_session_pl, '', "Session P&L summary")
+register_command('sessionreport', session_report, '', "Session summary report")
+register_command('marketstatus', show_market_status, '', "Market status")
+register_command('suggest', suggest_ticker, '', "Suggest a ticker")
+register_command('autocomplete', autocomplete_ticker, '<partial>', "Suggest tickers seen this session")
+register_command('tabcomplete', tab_complete, '[prefix...]', "List completions for a partial command line")
+register_command('news', show_news, '', "Market news headlines")
+register_command('ai', ask_hackclub_ai, '<prompt...>', "Ask Hack Club AI any question")
+register_command('integrations', integrations_menu, '', "Integrations menu")
+register_command('exportcsv', export_portfolio_csv, '[file]', "Export positions with current prices to CSV", positions=True,
+                 quotes=held_tickers, files=True)
+register_command('export', export_dataset, '<dataset:positions|trades|notes|series|bars> [file]',
+                 "Stream a dataset to .csv, .jsonl or .col (columnar)", positions=True, files=True)
+register_command('import', import_dataset, '<dataset:positions|trades|notes|series|bars> <file>',
+                 "Validate and import a dataset file", positions=True, files=True)
+register_command('exportall', export_all, '[target] [format:csv|jsonl|col]',
+                 "Export everything to a directory (or one .json file)", positions=True, quotes=held_tickers,
+                 files=True)
+register_command('importall', import_all, '[target]', "Replace the session from an exportall directory or .json",
+                 positions=True, files=True)
+register_command('save', save_data, '', "Snapshot the session to disk", positions=True, files=True)
+register_command('load', load_data, '', "Reload the session from disk", positions=True)
+register_command('macro', create_macro, '<name> <commands...>', "Define a macro (commands separated by ;, $1 $2 ... for arguments)")
+register_command('macros', show_macros, '', "List macros")
+register_command('runmacro', run_macro, '<name> [args*]', "Run a macro with its arguments", positions=True,
+                 quotes=macro_tickers)
+register_command('stats', stats_command, '[action:show|reset|json|prom|on|off] [file]',
+                 "Command timings, HTTP and cache counters (json/prom export to a file if given)",
+                 files=lambda values: len(values) > 1)
+register_command('cprofile', cprofile_command, '<command...>', "Run one command under cProfile", positions=True,
+                 interactive=profiled_interactive)
+register_command('profile', switch_profile, '[name]', "Show or switch profile (each has its own positions and state)",
+                 ('switchprofile',), positions=True)
+register_command('profiles', list_profiles, '', "List profiles")
+register_command('apikeys', manage_apikeys, '', "API key management")
+register_command('theme', change_theme, '<name>', "Change the colour theme")
+register_command('undo', undo_last_action, '', "Undo the last action")
+register_command('interactive', toggle_interactive, '', "Toggle interactive mode")
+register_command('quickstart', quick_start, '', "Quick start guide")
+register_command('feedback', submit_feedback, '<message...>', "Send feedback")
+register_command('setmode', set_trading_mode, '<mode:dummy|real>', "Set trading mode", sets_mode=True)
+register_command('config', configure_command, '', "Configure credentials for real trading mode", interactive=True,
+                 sets_mode=True)
+register_command('clear', clear_screen, '', "Clear the terminal screen", ('cls',))
+register_command('exit', exit_session, '', "Exit the terminal", ('quit',))
+
+
+def process_command(command: str, args: List[str], positions: Dict[str, Dict]) -> bool:
+    started = time.perf_counter()
+    network = metrics.network_seconds
+    with price_snapshot() as snapshot:
+        keep_running = dispatch_command(command, args, positions)
+        check_alerts()
+    maybe_compact(positions)
+    if metrics.enabled:
+        name = commands[command.lower()].name if command.lower() in commands else 'unknown'
+        metrics.observe('command', name, time.perf_counter() - started)
+        metrics.observe('command_network', name, metrics.network_seconds - network)
+        metrics.count('command_fetches', name, snapshot.fetches)
+        if last_status != STATUS_OK:
+            metrics.count('command_errors', name)
+    return keep_running
+
+
+def execute_command(command: Command, values: list, positions: Dict[str, Dict]):
+    if remote_caller and command.touches_files(values):
+        print(f"'{command.name}' reads or writes files, which daemon clients cannot do; run it with --local.")
+        return False
+    if remote_caller and command.sets_mode and not remote_real:
+        print(f"'{command.name}' is disabled for daemon clients; start the daemon with --mode real --allow-remote-real.")
+        return False
+    if command.positions:
+        values.insert(0, positions)
+    return command.handler(*values)
+
+
+def dispatch_command(name: str, args: List[str], positions: Dict[str, Dict]) -> bool:
+    global last_status
+    command_history.append(' '.join([name] + args))
+    command = commands.get(name.lower())
+    if command is None:
+        last_status = STATUS_USAGE
+        print("Unknown command. Type 'help' for available commands.")
+        return True
+    try:
+        values = command.parse(args)
+    except ValueError as e:
+        last_status = STATUS_USAGE
+        print(e)
+        return True
+    result = execute_command(command, values, positions)
+    last_status = STATUS_FAILED if result is False else STATUS_OK
+    return result is not EXIT
+
+
+def strip_comment(line: str) -> str:
+    # '#' opens a comment at the start of a line or as a word of its own, so arguments such as
+    # alert ids (#3) and free text containing '#' are kept.
+    if line.lstrip().startswith('#'):
+        return ''
+    for i, char in enumerate(line):
+        if char == '#' and line[i - 1].isspace() and (i + 1 == len(line) or line[i + 1].isspace()):
+            return line[:i]
+    return line
+
+
+def parse_script(lines: List[str]) -> Tuple[List[Tuple[int, str, Command, list]], List[str]]:
+    steps = []
+    errors = []
+    for number, line in enumerate(lines, 1):
+        line = strip_comment(line)
+        # A macro definition keeps its ; separators for the macro itself.
+        texts = [line] if [word.lower() for word in line.split()[:1]] == ['macro'] else line.split(';')
+        for text in texts:
+            parts = text.split()
+            if not parts:
+                continue
+            command = commands.get(parts[0].lower())
+            if command is None:
+                errors.append(f"line {number}: unknown command '{parts[0]}'")
+                continue
+            if command.needs_terminal(parts[1:]):
+                errors.append(f"line {number}: '{command.name}' needs an interactive terminal")
+                continue
             try:
-                qty = int(args[1])
-                if qty <= 0:
-                    raise ValueError
-            except ValueError:
-                print("Quantity must be a positive integer.")
-                return True
-            if ticker not in positions or positions[ticker]['qty'] < qty:
-                print("Insufficient shares to sell.")
-            else:
-                price = get_market_price(ticker)
-                total_value = round(price * qty, 2)
-                avg_cost = positions[ticker]['cost'] / positions[ticker]['qty']
-                if TRADING_MODE == "real":
-                    if not TRADING_CONFIG:
-                        print("Please configure your trading platform by running 'config'.")
-                        return True
-                    place_real_order("sell", ticker, qty, price)
-                    positions[ticker]['qty'] -= qty
-                    positions[ticker]['cost'] -= avg_cost * qty
-                    if positions[ticker]['qty'] == 0:
-                        del positions[ticker]
-                else:
-                    positions[ticker]['qty'] -= qty
-                    positions[ticker]['cost'] -= avg_cost * qty
-                    if positions[ticker]['qty'] == 0:
-                        del positions[ticker]
-                    print(f"Sold {qty} shares of {ticker} at ${price}/share for ${total_value}.")
-            update_portfolio_history(positions)
-    elif command == 'positions':
-        if not positions:
-            print("No positions held.")
-        else:
-            print("Current Positions:")
-            total_unrealized = 0.0
-            for ticker, pos in positions.items():
-                current_price = get_market_price(ticker)
-                avg_cost = pos['cost'] / pos['qty']
-                unrealized = round((current_price - avg_cost) * pos['qty'], 2)
-                total_unrealized += unrealized
-                print(f"  {ticker}: {pos['qty']} shares (avg cost: ${avg_cost:.2f}, current: ${current_price}) -> P/L: ${unrealized}")
-            print(f"Total Unrealized P/L: ${total_unrealized}")
-    elif command == 'dashboard':
-        if len(args) == 1 and args[0] in ['gainers', 'losers', 'all']:
-            dashboard_summary(positions, filter_type=args[0] if args[0] != 'all' else None)
-        else:
-            dashboard_summary(positions)
-    elif command == 'analytics':
-        show_analytics()
-    elif command == 'alert':
-        set_alert()
-    elif command == 'alertpct':
-        set_percentage_alert()
-    elif command == 'integrations':
-        integrations_menu()
-    elif command == 'exportcsv':
-        export_portfolio_csv(positions)
-    elif command == 'customize':
-        customize_dashboard()
-    elif command == 'chart':
-        if len(args) == 0:
-            print("Usage: chart <ticker> [interval]")
-        else:
-            ticker = args[0].upper()
-            interval = args[1] if len(args) > 1 else '5min'
-            show_chart(ticker, interval)
-    elif command == 'popular':
-        show_popular_pairs(positions)
-    elif command == 'favourite':
-        if len(args) != 1:
-            print("Usage: favourite <ticker>")
-        else:
-            add_favourite(args[0])
-    elif command == 'removefav':
-        remove_favourite()
-    elif command == 'favourites':
-        show_favourites()
-    elif command == 'screener':
-        show_screener()
-    elif command == 'gainers':
-        show_gainers_losers()
-    elif command == 'lasttrade':
-        show_last_trade_time()
-    elif command == 'history':
-        show_portfolio_history()
-    elif command == 'performance':
-        # Simple performance summary
-        print("Performance summary (feature coming soon)")
-    elif command == 'save':
-        save_data(positions, favourites)
-    elif command == 'load':
-        loaded_positions, loaded_favourites = load_data()
-        positions.clear()
-        positions.update(loaded_positions)
-        favourites = loaded_favourites
-    elif command == 'notes':
-        if not args:
-            print("Usage: notes <ticker> [note]")
-        elif len(args) == 1:
-            show_notes(args[0])
-        else:
-            add_note(args[0], ' '.join(args[1:]))
-    elif command == 'diversify':
-        diversification_analysis(positions)
-    elif command == 'suggest':
-        suggest_ticker()
-    elif command == 'news':
-        show_news()
-    elif command == 'historycmds':
-        show_command_history()
-    elif command == 'clearalerts':
-        clear_all_alerts()
-    elif command == 'candlestick':
-        if not args:
-            print("Usage: candlestick <ticker>")
-        else:
-            show_candlestick_chart(args[0])
-    elif command == 'addwatch':
-        if not args:
-            print("Usage: addwatch <ticker>")
-        else:
-            add_to_watchlist(args[0])
-    elif command == 'removewatch':
-        if not args:
-            print("Usage: removewatch <ticker>")
-        else:
-            remove_from_watchlist(args[0])
-    elif command == 'watchlist':
-        show_watchlist()
-    elif command == 'convert':
-        if not args:
-            print("Usage: convert <currency>")
-        else:
-            convert_portfolio(args[0], positions)
-    elif command == 'rebalance':
-        suggest_rebalance(positions)
-    elif command == 'dividends':
-        simulate_dividends(positions)
-    elif command == 'autocomplete':
-        if not args:
-            print("Usage: autocomplete <partial>")
-        else:
-            autocomplete_ticker(args[0])
-    elif command == 'marketstatus':
-        show_market_status()
-    elif command == 'sessionpl':
-        show_session_pl()
-    elif command == 'exportnotes':
-        export_notes()
-    elif command == 'importnotes':
-        import_notes()
-    elif command == 'setdashboard':
-        if not args:
-            print("Usage: setdashboard <tickers>")
-        else:
-            set_default_dashboard(args)
-    elif command == 'volatile':
-        show_volatile()
-    elif command == 'topvolume':
-        show_top_volume()
-    elif command == 'sectorbreakdown':
-        show_sector_breakdown()
-    elif command == 'rsi':
-        if not args:
-            print("Usage: rsi <ticker>")
-        else:
-            show_rsi(args[0])
-    elif command == 'ma':
-        if len(args) != 2:
-            print("Usage: ma <ticker> <window>")
-        else:
+                steps.append((number, ' '.join(parts), command, command.parse(parts[1:])))
+            except ValueError as e:
+                errors.append(f"line {number}: {e}")
+    return steps, errors
+
+
+def prefetch_quotes(steps: List[Tuple[Command, list]], positions: Dict[str, Dict]) -> int:
+    tickers: Set[str] = set()
+    defined: Dict[str, Macro] = {}
+    for command, values in steps:
+        if command.name == 'macro':
             try:
-                window = int(args[1])
-                show_moving_average(args[0], window)
+                defined[values[0]] = Macro(values[0], values[1])
             except ValueError:
-                print("Window must be an integer.")
-    elif command == 'schedulealert':
-        if len(args) != 3:
-            print("Usage: schedulealert <ticker> <price> <interval>")
+                pass
+        elif command.quotes is macro_tickers:
+            tickers.update(macro_tickers(values, positions, defined))
         else:
+            tickers.update(command.quote_tickers(values, positions))
+    if tickers:
+        get_market_prices(sorted(tickers))
+    return len(tickers)
+
+
+def run_batch(lines: List[str], positions: Dict[str, Dict], as_json: bool = False, keep_going: bool = False) -> int:
+    import io
+    from contextlib import redirect_stdout
+    steps, errors = parse_script(lines)
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        return STATUS_USAGE
+    started = time.perf_counter()
+    prefetched = prefetch_quotes([(command, values) for _, _, command, values in steps], positions)
+    status = STATUS_OK
+    fetches = 0
+    for number, text, command, values in steps:
+        begun = time.perf_counter()
+        output = io.StringIO() if as_json else sys.stdout
+        with redirect_stdout(output):
             try:
-                price = float(args[1])
-                schedule_alert(args[0], price, args[2])
-            except ValueError:
-                print("Price must be a number.")
-    elif command == 'risk':
-        analyze_risk(positions)
-    elif command == 'macro':
-        if len(args) < 2:
-            print("Usage: macro <name> <commands>")
-        else:
-            create_macro(args[0], ' '.join(args[1:]))
-    elif command == 'runmacro':
-        if not args:
-            print("Usage: runmacro <name>")
-        else:
-            run_macro(args[0], positions)
-    elif command == 'profile':
-        if not args:
-            print("Usage: profile <name>")
-        else:
-            switch_profile(args[0])
-    elif command == 'switchprofile':
-        if not args:
-            print("Usage: switchprofile <name>")
-        else:
-            switch_profile(args[0])
-    elif command == 'apikeys':
-        manage_apikeys()
-    elif command == 'exportall':
-        export_all()
-    elif command == 'importall':
-        import_all()
-    elif command == 'tabcomplete':
-        tab_complete()
-    elif command == 'theme':
-        if not args:
-            print("Usage: theme <name>")
-        else:
-            change_theme(args[0])
-    elif command == 'sessionreport':
-        session_report()
-    elif command == 'undo':
-        undo_last_action()
-    elif command == 'interactive':
-        toggle_interactive()
-    elif command == 'quickstart':
-        quick_start()
-    elif command == 'feedback':
-        if not args:
-            print("Usage: feedback <message>")
-        else:
-            submit_feedback(' '.join(args))
-    elif command == 'overlay':
-        if len(args) < 2:
-            print("Usage: overlay <type> <ticker>")
+                parts = text.split()
+                keep_running = process_command(parts[0], parts[1:], positions)
+                result = last_status
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                keep_running, result = True, STATUS_FAILED
+        # Quotes the command had to fetch, beyond those prefetched or already cached.
+        fetched = last_snapshot.fetches if last_snapshot is not None else 0
+        fetches += fetched
+        if as_json:
+            print(json.dumps({'line': number, 'command': text, 'status': result,
+                              'ms': round((time.perf_counter() - begun) * 1000, 1), 'fetches': fetched,
+                              'output': output.getvalue().rstrip('\n')}))
+        if result != STATUS_OK:
+            status = STATUS_FAILED
+            if not keep_going:
+                break
+        if not keep_running:
+            break
+    if as_json:
+        print(json.dumps({'status': status, 'commands': len(steps), 'prefetched': prefetched, 'fetches': fetches,
+                          'ms': round((time.perf_counter() - started) * 1000, 1)}))
+    return status
+
+
+def parse_cli(argv: List[str]):
+    import argparse
+    parser = argparse.ArgumentParser(prog="tradecli", description="Run TradeCLI commands without the interactive prompt.")
+    parser.add_argument('script', nargs='?', help="file of commands, one per line, or - to read stdin")
+    parser.add_argument('-c', '--command', action='append', default=[],
+                        help="command to run (repeatable; separate several with ;)")
+    parser.add_argument('--mode', choices=['dummy', 'real'], default='dummy', help="trading mode (default: dummy)")
+    parser.add_argument('--profile', help="profile to run against (default: the last one used)")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per command and a summary")
+    parser.add_argument('--keep-going', action='store_true', help="run the remaining commands after a failure")
+    parser.add_argument('--metrics', metavar='FILE', help="write stats to FILE afterwards (.prom for Prometheus text)")
+    parser.add_argument('--daemon', action='store_true', help="serve commands from other TradeCLI processes on a Unix socket")
+    parser.add_argument('--socket', help=f"daemon socket (default: $TRADECLI_SOCKET, else {DAEMON_SOCKET} in "
+                                         "$XDG_RUNTIME_DIR or a private temporary directory)")
+    parser.add_argument('--local', action='store_true', help="run in this process even if a daemon is running")
+    parser.add_argument('--stop', action='store_true', help="stop the running daemon")
+    parser.add_argument('--allow-remote-real', action='store_true',
+                        help="with --daemon --mode real, let daemon clients trade in real mode")
+    opts = parser.parse_args(argv)
+    if opts.allow_remote_real and not (opts.daemon and opts.mode == 'real'):
+        parser.error("--allow-remote-real needs --daemon --mode real")
+    if not opts.script and not opts.command and not opts.daemon and not opts.stop and not opts.local:
+        parser.error("give a script file, - for stdin, or at least one -c command")
+    return opts
+
+
+def batch_main(argv: List[str]) -> int:
+    global TRADING_MODE, remote_real
+    opts = parse_cli(argv)
+    path = daemon_socket_path(opts.socket)
+    shared = bool(opts.socket or os.environ.get('TRADECLI_SOCKET'))
+    if opts.stop:
+        client = connect_daemon(path, shared)
+        if client is None:
+            print(f"No daemon is serving {path}.", file=sys.stderr)
+            return STATUS_FAILED
+        sys.stdout.write(client.request(op='shutdown').get('output', ''))
+        return STATUS_OK
+    if opts.local and not opts.script and not opts.command:
+        main(use_daemon=False)
+        return STATUS_OK
+    lines = list(opts.command)
+    try:
+        if opts.script == '-':
+            lines += sys.stdin.read().splitlines()
+        elif opts.script:
+            with open(opts.script, 'r', encoding='utf-8') as f:
+                lines += f.read().splitlines()
+    except OSError as e:
+        print(f"Cannot read script: {e}", file=sys.stderr)
+        return STATUS_USAGE
+    if opts.profile and not valid_profile_name(opts.profile):
+        print("Profile names use letters, digits, - and _ (up to 64 characters).", file=sys.stderr)
+        return STATUS_USAGE
+    client = None if opts.daemon or opts.local else connect_daemon(path, shared)
+    if client is not None:
+        try:
+            return remote_batch(client, lines, opts)
+        finally:
+            client.close()
+    TRADING_MODE = opts.mode
+    positions: Dict[str, Dict] = {}
+    open_session(positions, opts.profile)
+    load_plugins()
+    if opts.daemon:
+        remote_real = opts.allow_remote_real
+        return daemon_main(path, positions, shared)
+    status = run_batch(lines, positions, opts.json, opts.keep_going)
+    if opts.metrics:
+        try:
+            write_stats(opts.metrics)
+        except OSError as e:
+            print(f"Cannot write stats: {e}", file=sys.stderr)
+    return status
+
+
+def daemon_socket_path(path: Optional[str] = None) -> str:
+    # Never the working directory by default: anyone able to write there could plant a socket that
+    # the prompt would then connect to on its own.
+    return path or os.environ.get('TRADECLI_SOCKET') or os.path.join(runtime_dir(), DAEMON_SOCKET)
+
+
+def runtime_dir() -> str:
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime and os.path.isdir(runtime):
+        return runtime
+    import getpass
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), f"tradecli-{getpass.getuser()}")
+
+
+def private_dir(path: str) -> bool:
+    # Creates path (0700) if needed; True when it belongs to this user and nobody else can write to it.
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.stat(path)
+    except OSError:
+        return False
+    return info.st_uid == os.getuid() and not info.st_mode & 0o022
+
+
+def owned_socket(path: str) -> bool:
+    try:
+        return os.stat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def capture_output(func, *args):
+    import io
+    from contextlib import redirect_stdout
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            result = func(*args)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            result = None
+    return result, output.getvalue()
+
+
+def daemon_command(text: str, positions: Dict[str, Dict]) -> Dict:
+    global last_status
+    parts = text.split() if isinstance(text, str) else []
+    if not parts:
+        last_status = STATUS_USAGE
+        return {'status': STATUS_USAGE, 'output': "Empty command.\n"}
+    command = commands.get(parts[0].lower())
+    if command is not None and command.needs_terminal(parts[1:]):
+        last_status = STATUS_USAGE
+        return {'status': STATUS_USAGE, 'output': f"'{command.name}' needs an interactive terminal; run it without the daemon.\n"}
+    last_status = STATUS_FAILED
+    keep_running, output = capture_output(process_command, parts[0], parts[1:], positions)
+    return {'status': last_status, 'output': output, 'exit': keep_running is False}
+
+
+def daemon_request(request: Dict, positions: Dict[str, Dict], in_use: Set[str] = frozenset()) -> Dict:
+    # Runs on the daemon's single worker thread, so commands never interleave. in_use holds the
+    # profiles of the other connected clients, whose alerts stay monitored whichever profile is active.
+    global TRADING_MODE, remote_caller
+    started = time.perf_counter()
+    if not isinstance(request, dict):
+        return {'status': STATUS_USAGE, 'output': "Malformed request.\n", 'profile': current_profile}
+    op = request.get('op', 'command')
+    requested = request.get('mode')
+    if requested == 'real' and not remote_real:
+        return {'status': STATUS_USAGE, 'profile': current_profile,
+                'output': "Real trading is disabled for daemon clients; start the daemon with --mode real --allow-remote-real.\n"}
+    profile = request.get('profile')
+    if profile and profile != current_profile and op != 'ping':
+        if not valid_profile_name(profile):
+            return {'status': STATUS_USAGE, 'output': "Invalid profile name.\n", 'profile': current_profile}
+        # Clients only hear about the switch when it fails.
+        switched, output = capture_output(switch_profile, positions, profile)
+        if switched is False:
+            return {'status': STATUS_FAILED, 'output': output, 'profile': current_profile}
+    # Without --allow-remote-real, clients run in dummy mode whatever mode the daemon itself is in.
+    mode = TRADING_MODE
+    scoped = requested in ('dummy', 'real') or not remote_real
+    if scoped:
+        TRADING_MODE = requested if requested in ('dummy', 'real') else 'dummy'
+    remote_caller = True
+    try:
+        if op == 'ping':
+            reply = {'status': STATUS_OK, 'pid': os.getpid(), 'mode': TRADING_MODE}
+        elif op == 'command':
+            reply = daemon_command(request.get('text', ''), positions)
+        elif op == 'batch':
+            status, batch_output = capture_output(run_batch, request.get('lines', []), positions,
+                                                  bool(request.get('json')), bool(request.get('keep_going')))
+            reply = {'status': STATUS_FAILED if status is None else status, 'output': batch_output}
+            if request.get('metrics'):
+                reply['metrics'] = (metrics.prometheus() if request['metrics'] == 'prom'
+                                    else json.dumps(metrics.to_dict(), indent=1))
+        elif op == 'shutdown':
+            reply = {'status': STATUS_OK, 'output': "Daemon stopping.\n", 'shutdown': True}
         else:
-            show_overlay(args[0], args[1])
-    else:
-        print("Unknown command. Type 'help' for available commands.")
-    check_alerts()
-    check_percentage_alerts()
-    return True
+            reply = {'status': STATUS_USAGE, 'output': f"Unknown request '{op}'.\n"}
+    finally:
+        remote_caller = False
+        if scoped:
+            TRADING_MODE = mode
+    park_profiles(set(in_use))
+    reply['profile'] = current_profile
+    reply['ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return reply
+
+
+def daemon_running(path: str) -> bool:
+    import socket
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return False
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+async def serve_daemon(path: str, positions: Dict[str, Dict], shared: bool = False):
+    import asyncio
+    global notice_sink
+    from concurrent.futures import ThreadPoolExecutor
+    loop = asyncio.get_running_loop()
+    worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tradecli-daemon")
+    # writer -> the profile its client was on at its last reply
+    clients: Dict = {}
+    stopping = asyncio.Event()
+
+    def broadcast(message: str, profile: str):
+        line = (json.dumps({'notice': message}) + "\n").encode()
+        for writer, client_profile in list(clients.items()):
+            if client_profile == profile:
+                writer.write(line)
+
+    def profiles_in_use(exclude=None) -> Set[str]:
+        return {p for w, p in clients.items() if p and w is not exclude}
+
+    async def handle(reader, writer):
+        clients[writer] = None
+        try:
+            while not stopping.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    reply = {'status': STATUS_USAGE, 'output': "Malformed request.\n"}
+                else:
+                    try:
+                        reply = await loop.run_in_executor(worker, daemon_request, request, positions,
+                                                           profiles_in_use(writer))
+                    except Exception as e:
+                        reply = {'status': STATUS_FAILED, 'output': f"An error occurred: {e}\n"}
+                clients[writer] = reply.get('profile', clients[writer])
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+                if reply.get('shutdown'):
+                    stopping.set()
+        except ConnectionError:
+            pass
+        finally:
+            del clients[writer]
+            writer.close()
+            if not stopping.is_set():
+                loop.run_in_executor(worker, park_profiles, profiles_in_use())
+
+    notice_sink = lambda message, profile: loop.call_soon_threadsafe(broadcast, message, profile)
+    server = await asyncio.start_unix_server(handle, path)
+    # An explicit socket path is opened to the group so analysts on one host can share a daemon.
+    os.chmod(path, 0o660 if shared else 0o600)
+    print(f"TradeCLI daemon serving {path} (profile {current_profile}, {TRADING_MODE} mode). Ctrl-C to stop.")
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        notice_sink = None
+        worker.shutdown(wait=True)
+        park_profiles(set())
+
+
+def daemon_main(path: str, positions: Dict[str, Dict], shared: bool = False) -> int:
+    import asyncio
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        print("Daemon mode needs Unix domain sockets.", file=sys.stderr)
+        return STATUS_USAGE
+    if not shared and not private_dir(os.path.dirname(path)):
+        print(f"{os.path.dirname(path)} is not a private directory; pass --socket to choose another path.",
+              file=sys.stderr)
+        return STATUS_USAGE
+    if daemon_running(path):
+        print(f"A daemon is already serving {path}.", file=sys.stderr)
+        return STATUS_USAGE
+    if os.path.exists(path):
+        os.unlink(path)
+    try:
+        asyncio.run(serve_daemon(path, positions, shared))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+        close_session(positions)
+    return STATUS_OK
+
+
+class DaemonClient:
+    # Line-delimited JSON over the daemon socket. A reader thread shows alert notices as they arrive,
+    # even while the prompt is idle, and hands replies back to request().
+    def __init__(self, path: str):
+        import queue
+        import socket
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.profile: Optional[str] = None
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read, name="daemon-client", daemon=True).start()
+
+    def _read(self):
+        try:
+            with self.sock.makefile('rb') as f:
+                for line in f:
+                    reply = json.loads(line)
+                    if 'notice' in reply:
+                        notify(reply['notice'])
+                    else:
+                        self._replies.put(reply)
+        except (OSError, ValueError):
+            pass
+        self._replies.put(None)
+
+    def request(self, **request) -> Dict:
+        if self.profile and 'profile' not in request:
+            request['profile'] = self.profile
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+        reply = self._replies.get()
+        if reply is None:
+            raise ConnectionError("daemon closed the connection")
+        self.profile = reply.get('profile', self.profile)
+        return reply
+
+    def close(self):
+        self.sock.close()
+
+
+def connect_daemon(path: str, shared: bool = False) -> Optional[DaemonClient]:
+    # The default socket is only trusted when this user owns it; a shared one has to be named explicitly.
+    import socket
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    if not shared and not owned_socket(path):
+        return None
+    try:
+        return DaemonClient(path)
+    except OSError:
+        return None
+
+
+def remote_batch(client: DaemonClient, lines: List[str], opts) -> int:
+    # Validated here first: the daemon's stderr is not the caller's.
+    load_plugins()
+    _, errors = parse_script(lines)
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        return STATUS_USAGE
+    request = {'op': 'batch', 'lines': lines, 'json': opts.json, 'keep_going': opts.keep_going, 'mode': opts.mode}
+    if opts.profile:
+        request['profile'] = opts.profile
+    if opts.metrics:
+        request['metrics'] = 'prom' if opts.metrics.endswith('.prom') else 'json'
+    reply = client.request(**request)
+    sys.stdout.write(reply.get('output', ''))
+    if opts.metrics and 'metrics' in reply:
+        try:
+            with open(opts.metrics, 'w', encoding='utf-8') as f:
+                f.write(reply['metrics'])
+        except OSError as e:
+            print(f"Cannot write stats: {e}", file=sys.stderr)
+    return reply.get('status', STATUS_FAILED)
 
 
-def main():
+def remote_main(client: DaemonClient):
+    reply = client.request(op='ping')
+    print(f"Connected to the TradeCLI daemon at {client.path} (profile {reply['profile']}, {reply['mode']} mode).")
+    print("Type 'help' to see available commands.")
+    install_completion()
+    while True:
+        try:
+            user_input = read_command()
+            if not user_input:
+                continue
+            reply = client.request(op='command', text=user_input)
+            sys.stdout.write(reply.get('output', ''))
+            if reply.get('exit'):
+                break
+        except (KeyboardInterrupt, EOFError):
+            print("\nExiting TradeCLI. Goodbye!")
+            break
+        except (ConnectionError, OSError) as e:
+            print(f"Lost the daemon connection: {e}")
+            break
+    client.close()
+
+
+def main(use_daemon: bool = True):
     global TRADING_MODE
+    client = connect_daemon(daemon_socket_path(), bool(os.environ.get('TRADECLI_SOCKET'))) if use_daemon else None
+    if client is not None:
+        remote_main(client)
+        return
     clear_screen()
     print_banner()
     print(f"Welcome to TradeCLI!{RESET}")
@@ -986,10 +4024,12 @@ def main():
             configure_real_trading()
     print("Type 'help' to see available commands.")
     positions: Dict[str, Dict] = {}
-    update_portfolio_history(positions)  # Initialize history at start
+    open_session(positions)
+    load_plugins()
+    install_completion()
     while True:
         try:
-            user_input = input(f"TradeCLI> {RESET}").strip()
+            user_input = read_command()
             if not user_input:
                 print("\aNo command entered. Please type 'help' for available commands.")
                 continue
@@ -998,12 +4038,19 @@ def main():
             args = parts[1:]
             if not process_command(cmd, args, positions):
                 break
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             print("\nExiting TradeCLI. Goodbye!")
             break
         except Exception as ex:
             print(f"An error occurred: {ex}")
 
 
+def run(argv: List[str]) -> int:
+    if argv:
+        return batch_main(argv)
+    main()
+    return STATUS_OK
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(run(sys.argv[1:]))
\ No newline at end of file
@@ -0,0 +1,8 @@
+import sys
+
+# Kept tiny on purpose: "python main.py" recompiles the whole app on every launch, while importing
+# main here runs it from the cached bytecode in __pycache__.
+import main
+
+if __name__ == "__main__":
+    sys.exit(main.run(sys.argv[1:]))